@@ -1,13 +1,113 @@
+import uuid
+import queue
+import threading
+
+import streamlit as st
+
 from rag_chatbot import RestaurantRAG
 
-rag = RestaurantRAG()
 
-# Example usage in Streamlit
-import streamlit as st
+class SharedRAG:
+    """Process-wide RestaurantRAG, loaded once in a background thread and shared by all sessions"""
+
+    def __init__(self):
+        self.rag = None
+        self.error = None
+        self._ready = threading.Event()
+        # The generator pipeline is not safe to call from several script threads at once
+        self._lock = threading.Lock()
+        threading.Thread(target=self._load, name="rag-warmup", daemon=True).start()
+
+    def _load(self):
+        try:
+            self.rag = RestaurantRAG()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def query(self, question, session_id=None):
+        with self._lock:
+            return self.rag.query(question, session_id=session_id)
+
+    def query_stream(self, question, session_id=None):
+        """Stream an answer; the lock is held while it is generated, not while the caller displays it"""
+        chunks = queue.Queue()
+
+        def produce():
+            # Runs to the end even when the caller stops reading, so the lock is always released
+            try:
+                with self._lock:
+                    for chunk in self.rag.query_stream(question, session_id=session_id):
+                        chunks.put(chunk)
+                chunks.put(None)
+            except Exception as e:
+                chunks.put(e)
+
+        threading.Thread(target=produce, name="rag-generate", daemon=True).start()
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+@st.cache_resource
+def get_shared_rag():
+    return SharedRAG()
+
+
+shared = get_shared_rag()
+
+# Per-session conversation state lives apart from the shared model objects
+if "history" not in st.session_state:
+    st.session_state.history = []
+# Keys this browser session's conversation memory inside the shared RestaurantRAG
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 st.title("Zomato Restaurant Intelligence Assistant")
+
+if not shared.ready:
+    st.info("Warming up the assistant: loading the knowledge base and models...")
+    shared.wait(timeout=1.0)
+    st.rerun()
+
+if shared.error is not None:
+    st.error(f"Failed to load the assistant: {shared.error}")
+    st.stop()
+
 user_query = st.text_input("Ask a question about restaurants, menus, or dietary options:")
 
-if user_query:
-    answer = rag.query(user_query)
-    st.write(answer)
+# Streamlit reruns the script on every interaction; only answer new questions
+streamed = False
+if user_query and user_query != st.session_state.get("last_query"):
+    placeholder = st.empty()
+    answer = ""
+    # Closed explicitly: a rerun or stop interrupts this loop and would otherwise leave the stream to GC
+    stream = shared.query_stream(user_query, st.session_state.session_id)
+    try:
+        for chunk in stream:
+            answer += chunk
+            placeholder.write(answer)
+    finally:
+        stream.close()
+    st.session_state.history.append((user_query, answer.strip()))
+    st.session_state.last_query = user_query
+    streamed = True
+
+if st.session_state.history:
+    if not streamed:
+        st.write(st.session_state.history[-1][1])
+    for question, answer in reversed(st.session_state.history[:-1]):
+        st.markdown(f"**Q:** {question}")
+        st.markdown(f"**A:** {answer}")
@@ -0,0 +1,128 @@
+"""Compare loading documents.json with opening the memory-mapped document store.
+
+Each loader runs in a fresh process and builds the metadata index, as a
+chatbot worker does at startup. Startup time and resident memory per worker
+are reported, split into private (anonymous) pages and file-backed pages that
+every worker mapping the store shares (Linux only):
+
+    python benchmarks/bench_doc_store.py --synthetic 300000
+    python benchmarks/bench_doc_store.py --documents knowledge_base/documents.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_documents(num_documents, seed=0):
+    rng = np.random.default_rng(seed)
+    documents = []
+    for i in range(num_documents):
+        restaurant = f"Synthetic Diner {i // 60:05d}"
+        documents.append({
+            "id": f"menu-item-{restaurant}-dish-{i}".replace(' ', '-').lower(),
+            "content": f"Restaurant: {restaurant}\nMenu item: Dish {i}\nDescription: House special number {i}, "
+                       f"slow cooked\nCategory: Main Course\nPrice: Rs {100 + i % 900}\nDietary info: Vegetarian",
+            "metadata": {"type": "menu_item", "restaurant": restaurant, "name": f"Dish {i}",
+                         "category": ["Starters", "Main Course", "Desserts"][i % 3],
+                         "price_value": float(100 + i % 900), "price_category": "Moderate",
+                         "dietary_info": ["Vegetarian", "Non-Vegetarian"][i % 2]}
+        })
+    return documents, rng.standard_normal((num_documents, 384)).astype('float32')
+
+
+def _rss_mib():
+    """Private and file-backed resident memory of this process, from /proc"""
+    usage = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('RssAnon:', 'RssFile:')):
+                key, value = line.split(':')
+                usage[key] = int(value.split()[0]) / 1024
+    return usage.get('RssAnon', 0.0), usage.get('RssFile', 0.0)
+
+
+def _load(method, root, results):
+    from metadata_filter import MetadataIndex
+    from doc_store import DocumentStore
+    private_before, shared_before = _rss_mib()
+    start = time.perf_counter()
+    if method == 'json':
+        with open(os.path.join(root, 'documents.json'), 'r') as f:
+            documents = json.load(f)
+        embeddings = np.load(os.path.join(root, 'embeddings.npy')).astype('float32')
+    else:
+        documents = DocumentStore(os.path.join(root, 'doc_store'))
+        embeddings = np.load(os.path.join(root, 'embeddings.npy'), mmap_mode='r')
+    MetadataIndex(documents)
+    seconds = time.perf_counter() - start
+    # A typical request touches a few documents and their vectors
+    sample = np.random.default_rng(0).integers(0, len(documents), 50)
+    contents = [documents[int(i)]["content"] for i in sample]
+    np.asarray(embeddings[np.sort(sample)], dtype='float32')
+    private_after, shared_after = _rss_mib()
+    results.put({
+        "method": method,
+        "startup_s": seconds,
+        "private_mib": private_after - private_before,
+        "shared_mib": shared_after - shared_before,
+        "sampled": len(contents)
+    })
+
+
+def run_isolated(method, root):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_load, args=(method, root, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', help="documents.json to convert (embeddings.npy beside it is used if present)")
+    parser.add_argument('--synthetic', type=int, default=100000, help="Synthetic documents when --documents is not given")
+    args = parser.parse_args()
+
+    from doc_store import DocumentStore
+
+    with tempfile.TemporaryDirectory() as root:
+        if args.documents:
+            with open(args.documents, 'r', encoding='utf-8') as f:
+                documents = json.load(f)
+            embeddings_path = os.path.join(os.path.dirname(args.documents), 'embeddings.npy')
+            embeddings = (np.load(embeddings_path) if os.path.exists(embeddings_path)
+                          else np.zeros((len(documents), 384), dtype='float32'))
+        else:
+            documents, embeddings = synthetic_documents(args.synthetic)
+        with open(os.path.join(root, 'documents.json'), 'w', encoding='utf-8') as f:
+            json.dump(documents, f, indent=2, ensure_ascii=False)
+        np.save(os.path.join(root, 'embeddings.npy'), embeddings)
+        DocumentStore.write(documents, os.path.join(root, 'doc_store'))
+        del documents, embeddings
+
+        def size(path):
+            if os.path.isfile(path):
+                return os.path.getsize(path)
+            return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+        print(f"documents.json: {size(os.path.join(root, 'documents.json')) / 2**20:.1f} MiB, "
+              f"document store: {size(os.path.join(root, 'doc_store')) / 2**20:.1f} MiB, "
+              f"embeddings.npy: {size(os.path.join(root, 'embeddings.npy')) / 2**20:.1f} MiB")
+        for method in ('json', 'store'):
+            result = run_isolated(method, root)
+            print(f"{method:>6}: startup {result['startup_s']:6.2f} s, RSS per worker +{result['private_mib']:.1f} MiB private, "
+                  f"+{result['shared_mib']:.1f} MiB shared")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compare the row-wise and columnar knowledge-base builders.
+
+Generates a synthetic catalog (Restaurants.csv, Enhanced_Menu/ and Reviews/)
+in a temporary directory, runs both builders there and checks that the JSON
+they would write is byte-identical:
+
+    python benchmarks/bench_knowledge_base.py --restaurants 5000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['Starters', 'Main Course', 'Breads', 'Rice & Biryani', 'Desserts', 'Beverages', '']
+DIETARY = ['Vegetarian', 'Non-Vegetarian', 'Vegan', 'Unknown']
+TAGS = ['Bestseller', 'Spicy', "Chef's Special", 'New', '']
+
+
+def write_catalog(root, num_restaurants, items_per_menu, reviews_per_restaurant, seed=42):
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, 'Enhanced_Menu'))
+    os.makedirs(os.path.join(root, 'Reviews'))
+    restaurants = []
+    for i in range(num_restaurants):
+        name = f"Synthetic Diner {i:05d}"
+        locality = f"Sector {i % 97}, New Delhi"
+        restaurants.append({
+            "Type": "Restaurant", "Name": name, "Locality": locality,
+            "Opening_Hours": "12noon – 11pm (Today)", "Phone": f"+91{9000000000 + i}",
+            "Price_Range": f"₹{rng.randrange(200, 3000, 100)} for two people (approx.)",
+            "Cuisine": "North Indian, Chinese", "Rating": round(rng.uniform(2.5, 4.9), 1),
+            "Rating_Count": rng.randrange(10, 5000)
+        })
+        menu = pd.DataFrame({
+            "Name": [f"Dish {j}" if j % 50 else None for j in range(items_per_menu)],
+            "Price": [f"Rs {rng.randrange(50, 1500)}" if j % 13 else None for j in range(items_per_menu)],
+            "Description": [f"House special number {j}, slow cooked" for j in range(items_per_menu)],
+            "Category": [rng.choice(CATEGORIES) for _ in range(items_per_menu)],
+            "Standard_Category": [rng.choice(CATEGORIES) for _ in range(items_per_menu)],
+            "Dietary_Info": [rng.choice(DIETARY) for _ in range(items_per_menu)],
+            "Tags": [rng.choice(TAGS) for _ in range(items_per_menu)],
+        })
+        menu.to_csv(os.path.join(root, 'Enhanced_Menu', f"{name}, {locality}.csv"), index=False)
+        reviews = pd.DataFrame({
+            "Author": [f"Guest {k}" for k in range(reviews_per_restaurant)],
+            "Rating": [rng.randint(1, 5) for _ in range(reviews_per_restaurant)],
+            "Description": [f"Rated\n  {k}/5 — great   food! 😀 ✨" if k % 7 else None
+                            for k in range(reviews_per_restaurant)],
+        })
+        reviews.to_csv(os.path.join(root, 'Reviews', f"{name.replace(' ', '_')}_reviews.csv"), index=False)
+    pd.DataFrame(restaurants).to_csv(os.path.join(root, 'Restaurants.csv'), index=False)
+
+
+def dump(value):
+    return json.dumps(value, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--restaurants', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=60, help="Menu items per restaurant")
+    parser.add_argument('--reviews', type=int, default=15, help="Reviews per restaurant")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for the columnar builder")
+    args = parser.parse_args()
+
+    import build_knowledge_base as kb
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Writing {args.restaurants} restaurants x {args.items} items to {root}")
+        write_catalog(root, args.restaurants, args.items, args.reviews)
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            start = time.perf_counter()
+            old_kb = kb.load_restaurant_data()
+            old_docs = kb.create_restaurant_documents(old_kb)
+            old_seconds = time.perf_counter() - start
+            old_bytes = dump(old_kb), dump(old_docs)
+            del old_kb, old_docs
+
+            start = time.perf_counter()
+            new_kb, new_docs = kb.build_knowledge_base_columnar(workers=args.workers)
+            new_seconds = time.perf_counter() - start
+            new_bytes = dump(new_kb), dump(new_docs)
+        finally:
+            os.chdir(cwd)
+
+    print(f" row-wise: {old_seconds:7.2f} s")
+    print(f" columnar: {new_seconds:7.2f} s ({old_seconds / new_seconds:.1f}x)")
+    print(f"restaurant_data.json identical: {old_bytes[0] == new_bytes[0]}")
+    print(f"documents.json identical:       {old_bytes[1] == new_bytes[1]} ({len(new_docs)} documents)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compare full BeautifulSoup parsing with the targeted page_extract layer.
+
+Runs both extraction paths over saved Zomato pages (see stub_server.save_page)
+or over synthetic menu pages, each in a fresh process so peak RSS is comparable:
+
+    python benchmarks/bench_page_extract.py --pages-dir saved_pages
+    python benchmarks/bench_page_extract.py --synthetic 2000
+"""
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import resource
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_page(num_items):
+    """A page shaped like a Zomato order page with `num_items` menu items"""
+    restaurant = {"@type": "Restaurant", "name": "Synthetic", "address": {}, "reviews": []}
+    menu = {"@type": "Menu", "hasMenuSection": [
+        {"name": "Mains", "hasMenuItem": [{"name": f"Item {i}", "description": f"Dish {i}"} for i in range(num_items)]}
+    ]}
+    items = "".join(
+        f'<div class="c{i}"><h4>Item {i}</h4><div><span>Vegetarian</span><span>Spicy</span></div><span>₹{100 + i}</span></div>'
+        for i in range(num_items)
+    )
+    filler = "".join(f'<div class="nav"><a href="/x{i}">Link {i}</a></div>' for i in range(num_items))
+    return (
+        '<html><head><title>Synthetic Order Online - Zomato</title>'
+        '<script type="application/ld+json">{"@type": "WebSite"}</script>'
+        f'<script type="application/ld+json">{json.dumps(restaurant)}</script>'
+        '<script type="application/ld+json">{"@type": "BreadcrumbList"}</script>'
+        f'<script type="application/ld+json">{json.dumps(menu)}</script>'
+        f'</head><body>{filler}<section>{items}</section></body></html>'
+    )
+
+
+def extract_soup(page):
+    """The previous approach: a full BeautifulSoup tree per page"""
+    from bs4 import BeautifulSoup
+    html_text = BeautifulSoup(page, 'lxml')
+    blocks = [json.loads(script.string) for script in html_text.find_all('script', type='application/ld+json')]
+    divs = [div.find_all(text=True) for div in html_text.find_all('div') if div.find('h4', recursive=False)]
+    return len(blocks), len(divs)
+
+
+def extract_targeted(page):
+    from page_extract import extract_ld_json, extract_menu_divs
+    return len(extract_ld_json(page)), len(extract_menu_divs(page))
+
+
+def _run(method, pages, results):
+    extract = extract_soup if method == 'soup' else extract_targeted
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    counts = None
+    for page in pages:
+        start = time.perf_counter()
+        counts = extract(page)
+        timings.append((time.perf_counter() - start) * 1000)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        "method": method,
+        "median_ms": statistics.median(timings),
+        "total_ms": sum(timings),
+        "peak_rss_delta_kb": peak - baseline,
+        "last_counts": counts
+    })
+
+
+def run_isolated(method, pages):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run, args=(method, pages, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages-dir', default='saved_pages')
+    parser.add_argument('--synthetic', type=int, default=0, help="Menu items per synthetic page")
+    parser.add_argument('--repeat', type=int, default=5, help="Synthetic pages to generate")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        pages = [synthetic_page(args.synthetic) for _ in range(args.repeat)]
+    else:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages_dir, '*.html'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+    if not pages:
+        print("No pages to benchmark. Save pages with stub_server.save_page or pass --synthetic N.")
+        return
+
+    print(f"Benchmarking {len(pages)} pages ({sum(map(len, pages)) / len(pages) / 1024:.0f} KiB average)")
+    results = [run_isolated(method, pages) for method in ('soup', 'targeted')]
+    for result in results:
+        print(f"{result['method']:>9}: {result['median_ms']:8.2f} ms/page median, "
+              f"{result['total_ms']:9.1f} ms total, peak RSS +{result['peak_rss_delta_kb'] / 1024:.1f} MiB, "
+              f"counts {result['last_counts']}")
+    print(f"Speed-up: {results[0]['median_ms'] / max(results[1]['median_ms'], 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""End-to-end benchmark of RestaurantRAG with a latency breakdown per stage.
+
+Questions come from a JSONL log (one object per line with a "question",
+"query" or "body" field, optionally labeled with "relevant_ids" or
+"relevant_restaurants"), from a text file with one question per line, or
+from a built-in sample. The run reports:
+
+- cold start: imports plus model and knowledge base loading, and the first query
+- p50/p95/p99 per stage (embed, dense/sparse search, rerank, prompt assembly,
+  generation) over sequential queries with caching disabled
+- throughput and latency at several concurrency levels, through the same
+  micro-batcher rag_server.py uses
+- recall@k and hit rate on labeled questions, and peak RSS
+
+The report is printed and can be written as JSON to compare runs across commits:
+
+    python benchmarks/bench_rag.py --questions questions.jsonl --json bench.json
+    python benchmarks/bench_rag.py --concurrency 1 4 16 --backend int8 --rerank
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from check_backend_parity import SAMPLE_QUESTIONS
+
+QUESTION_FIELDS = ('question', 'query', 'body', 'text')
+PERCENTILES = (50, 95, 99)
+
+
+def load_questions(path=None):
+    """[(question, labels)] where labels is {"relevant_ids": [...]} / {"relevant_restaurants": [...]} or {}"""
+    if path is None:
+        return [(question, {}) for question in SAMPLE_QUESTIONS]
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith('{'):
+                questions.append((line, {}))
+                continue
+            record = json.loads(line)
+            question = next((record[field] for field in QUESTION_FIELDS if record.get(field)), None)
+            if question:
+                labels = {key: record[key] for key in ('relevant_ids', 'relevant_restaurants') if record.get(key)}
+                questions.append((question, labels))
+    return questions
+
+
+def peak_rss_mib():
+    """Peak resident memory of this process (VmHWM, Linux)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values_ms):
+    if not values_ms:
+        return None
+    return {
+        **{f"p{p}": round(float(np.percentile(values_ms, p)), 3) for p in PERCENTILES},
+        "mean": round(float(np.mean(values_ms)), 3), "count": len(values_ms)
+    }
+
+
+class StageTimer:
+    """Wraps RestaurantRAG components so each call's duration is charged to a stage of the current query"""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def begin(self):
+        self.local.stages = {}
+
+    def end(self):
+        stages, self.local.stages = self.local.stages, None
+        return stages
+
+    def _charge(self, stage, seconds):
+        stages = getattr(self.local, 'stages', None)
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + seconds * 1000
+
+    def timed(self, stage, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._charge(stage, time.perf_counter() - start)
+        return wrapper
+
+    def wrap(self, obj, attr, stage):
+        if obj is not None:
+            setattr(obj, attr, self.timed(stage, getattr(obj, attr)))
+
+
+class TimedGenerator:
+    """Stands in for the generation pipeline: timed calls, everything else forwarded"""
+
+    def __init__(self, generator, timer):
+        self._generator = generator
+        self._call = timer.timed('generate', generator)
+
+    def __call__(self, *args, **kwargs):
+        return self._call(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._generator, name)
+
+
+def instrument(rag, timer):
+    timer.wrap(rag, '_embed_batch', 'embed')
+    timer.wrap(rag, '_search', 'dense_search')
+    timer.wrap(rag.sparse_index, 'search', 'sparse_search')
+    timer.wrap(rag.reranker, 'rerank_batch', 'rerank')
+    timer.wrap(rag.context_budgeter, 'assemble', 'assemble_prompt')
+    rag.generator = TimedGenerator(rag.generator, timer)
+
+
+def stage_breakdown(rag, timer, questions, repeat):
+    """Sequential queries; per-stage and total latency percentiles in ms"""
+    samples = {}
+    for _ in range(repeat):
+        for question, _ in questions:
+            timer.begin()
+            start = time.perf_counter()
+            rag.query(question)
+            total = (time.perf_counter() - start) * 1000
+            stages = timer.end()
+            stages["other"] = max(0.0, total - sum(stages.values()))
+            stages["total"] = total
+            for stage, ms in stages.items():
+                samples.setdefault(stage, []).append(ms)
+    return {stage: percentiles(values) for stage, values in samples.items()}
+
+
+def throughput(rag, questions, concurrency, requests_per_client, max_batch_size, max_wait_ms):
+    """Closed-loop clients sending questions through a MicroBatcher, as in rag_server.py"""
+    from rag_server import MicroBatcher, batch_queries
+    batcher = MicroBatcher(lambda items: batch_queries(rag, items), max_batch_size, max_wait_ms,
+                           name=f"bench-batcher-{concurrency}")
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client(offset):
+        for i in range(requests_per_client):
+            question = questions[(offset + i) % len(questions)][0]
+            start = time.perf_counter()
+            try:
+                batcher.submit((question, None, None)).result()
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=client, args=(c * requests_per_client,)) for c in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(seconds, 3),
+        "queries_per_second": round(len(latencies) / seconds, 3) if seconds else None,
+        "latency_ms": percentiles(latencies),
+        "mean_batch_size": round(batcher.stats["requests"] / max(1, batcher.stats["batches"]), 2),
+    }
+
+
+def retrieval_recall(rag, questions, k):
+    """Mean recall@k and hit rate over questions labeled with relevant doc ids or restaurants"""
+    recalls, hits = [], []
+    for question, labels in questions:
+        if not labels:
+            continue
+        ranked = [doc for doc, _ in rag.retrieve_batch([question], top_k=k)[0]]
+        if labels.get('relevant_ids'):
+            relevant = set(labels['relevant_ids'])
+            found = relevant & {doc.get("id") for doc in ranked}
+        else:
+            relevant = {name.lower() for name in labels['relevant_restaurants']}
+            found = relevant & {str(doc.get("metadata", {}).get("restaurant", "")).lower() for doc in ranked}
+        recalls.append(len(found) / len(relevant))
+        hits.append(bool(found))
+    if not recalls:
+        return None
+    return {"k": k, "labeled_questions": len(recalls), "recall": round(float(np.mean(recalls)), 4),
+            "hit_rate": round(float(np.mean(hits)), 4)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    process_start = time.perf_counter()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', help="JSONL log or text file of questions (default: built-in sample)")
+    parser.add_argument('--limit', type=int, help="Use at most this many questions")
+    parser.add_argument('--repeat', type=int, default=1, help="Passes over the questions for the stage breakdown")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests-per-client', type=int, default=4)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--recall-k', type=int, default=5)
+    parser.add_argument('--backend', help="Inference backend (default: $RAG_INFERENCE_BACKEND or torch)")
+    parser.add_argument('--rerank', action='store_true')
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)[:args.limit]
+    if not questions:
+        parser.error("no questions to run")
+
+    # Caches are disabled so every query pays for every stage
+    from rag_chatbot import RestaurantRAG
+    load_start = time.perf_counter()
+    rag = RestaurantRAG(cache_size=0, backend=args.backend, rerank=args.rerank)
+    load_seconds = time.perf_counter() - load_start
+    start = time.perf_counter()
+    rag.query(questions[0][0])
+    first_query_ms = (time.perf_counter() - start) * 1000
+
+    timer = StageTimer()
+    instrument(rag, timer)
+    report = {
+        "commit": git_commit(),
+        "config": {"backend": rag.backend, "rerank": args.rerank, "index_type": rag.index_manifest.get("index_type"),
+                   "num_documents": len(rag.documents), "questions": len(questions), "repeat": args.repeat},
+        "cold_start": {
+            "process_to_ready_s": round(load_start - process_start + load_seconds, 3),
+            "load_s": round(load_seconds, 3),
+            "first_query_ms": round(first_query_ms, 3),
+        },
+        "stages_ms": stage_breakdown(rag, timer, questions, args.repeat),
+        "throughput": [
+            throughput(rag, questions, concurrency, args.requests_per_client, args.max_batch_size, args.max_wait_ms)
+            for concurrency in args.concurrency
+        ],
+        "retrieval": retrieval_recall(rag, questions, args.recall_k),
+    }
+    report["peak_rss_mib"] = round(peak_rss_mib(), 1)
+
+    print(f"Cold start {report['cold_start']['process_to_ready_s']:.2f} s, "
+          f"first query {report['cold_start']['first_query_ms']:.1f} ms, peak RSS {report['peak_rss_mib']:.0f} MiB")
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in report["stages_ms"].items():
+        print(f"{stage:<16}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+    for run in report["throughput"]:
+        latency = run["latency_ms"] or {"p50": float('nan'), "p99": float('nan')}
+        print(f"concurrency {run['concurrency']:>3}: {run['queries_per_second']:.2f} q/s, p50 {latency['p50']:.1f} ms, "
+              f"p99 {latency['p99']:.1f} ms, mean batch {run['mean_batch_size']}, errors {run['errors']}")
+    if report["retrieval"]:
+        print(f"Recall@{report['retrieval']['k']}: {report['retrieval']['recall']:.3f} "
+              f"(hit rate {report['retrieval']['hit_rate']:.3f} over {report['retrieval']['labeled_questions']} questions)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
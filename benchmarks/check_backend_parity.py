@@ -0,0 +1,134 @@
+"""Check a quantized or ONNX inference backend against the fp32 PyTorch path.
+
+Both backends answer the same questions over the same knowledge base. For
+each question the top-k retrieved documents are compared (overlap@k and
+top-1 agreement) and the generated answers are compared by text similarity.
+Per-query latency and resident memory of each backend are reported, and the
+script exits non-zero when the backend falls below the given thresholds:
+
+    python benchmarks/check_backend_parity.py --backend int8
+    python benchmarks/check_backend_parity.py --backend onnx-int8 --questions questions.txt --json parity.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import difflib
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_backend import INFERENCE_BACKENDS
+
+SAMPLE_QUESTIONS = [
+    "Which restaurant has the best vegetarian menu?",
+    "Show me gluten free items",
+    "What desserts are under 300 rupees?",
+    "Where can I get spicy paneer?",
+    "Which places serve vegan food?",
+    "What is the price range for biryani?",
+    "Recommend a restaurant with good reviews for pizza",
+    "What non-vegetarian starters are available?",
+    "Which restaurant is open late at night?",
+    "What drinks can I order with my meal?",
+]
+
+
+def _rss_mib():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _run_backend(backend, questions, top_k, results):
+    """Load RestaurantRAG with one backend in this process and record its retrievals and answers"""
+    from rag_chatbot import RestaurantRAG
+    start = time.perf_counter()
+    rag = RestaurantRAG(backend=backend, cache_size=0)
+    load_seconds = time.perf_counter() - start
+
+    retrieved, answers, latencies = [], [], []
+    for question in questions:
+        ranked = rag.retrieve_batch([question], top_k=top_k)[0]
+        start = time.perf_counter()
+        answers.append(rag.query(question))
+        latencies.append(time.perf_counter() - start)
+        retrieved.append([[doc.get("id"), doc["content"]] for doc, _ in ranked])
+    results[backend] = {
+        "load_seconds": load_seconds, "rss_mib": _rss_mib(), "retrieved": retrieved, "answers": answers,
+        "latency_ms": sorted(seconds * 1000 for seconds in latencies)
+    }
+
+
+def run(backend, questions, top_k):
+    # Each backend runs in its own process so its memory is measured alone
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Manager().dict()
+    for name in ('torch', backend):
+        process = ctx.Process(target=_run_backend, args=(name, questions, top_k, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(f"backend {name} failed with exit code {process.exitcode}")
+    return dict(results)
+
+
+def compare(reference, candidate, top_k):
+    overlaps, top1, similarities = [], [], []
+    for ref_docs, docs, ref_answer, answer in zip(reference["retrieved"], candidate["retrieved"],
+                                                  reference["answers"], candidate["answers"]):
+        ref_keys, keys = {tuple(doc) for doc in ref_docs}, {tuple(doc) for doc in docs}
+        overlaps.append(len(ref_keys & keys) / max(1, min(top_k, len(ref_keys))))
+        top1.append(bool(ref_docs) and bool(docs) and ref_docs[0] == docs[0])
+        similarities.append(difflib.SequenceMatcher(None, ref_answer.lower(), answer.lower()).ratio())
+    return {
+        "overlap_at_k": sum(overlaps) / len(overlaps),
+        "top1_agreement": sum(top1) / len(top1),
+        "answer_similarity": sum(similarities) / len(similarities),
+        "exact_answers": sum(s == 1.0 for s in similarities) / len(similarities),
+    }
+
+
+def _summary(result):
+    latencies = result["latency_ms"]
+    return {
+        "load_seconds": round(result["load_seconds"], 2), "rss_mib": round(result["rss_mib"], 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare an inference backend with fp32 PyTorch")
+    parser.add_argument('--backend', choices=[b for b in INFERENCE_BACKENDS if b != 'torch'], default='int8')
+    parser.add_argument('--questions', help="Text file with one question per line (default: built-in sample)")
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--min-overlap', type=float, default=0.8, help="Minimum mean overlap@k")
+    parser.add_argument('--min-similarity', type=float, default=0.7, help="Minimum mean answer similarity")
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    questions = SAMPLE_QUESTIONS
+    if args.questions:
+        with open(args.questions, 'r', encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    results = run(args.backend, questions, args.top_k)
+    report = {
+        "backend": args.backend, "questions": len(questions), "top_k": args.top_k,
+        **compare(results['torch'], results[args.backend], args.top_k),
+        "torch": _summary(results['torch']), args.backend: _summary(results[args.backend]),
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    failed = report["overlap_at_k"] < args.min_overlap or report["answer_similarity"] < args.min_similarity
+    if failed:
+        print(f"FAIL: {args.backend} is below the parity thresholds "
+              f"(overlap@k >= {args.min_overlap}, answer similarity >= {args.min_similarity})")
+    sys.exit(1 if failed else 0)
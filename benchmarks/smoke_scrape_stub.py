@@ -0,0 +1,98 @@
+"""Run the scrapers through scrape_engine against stub_server, without touching Zomato.
+
+Pages saved with `python main.py --save-pages saved_pages` are replayed for
+the same URLs; --synthetic writes one made-up restaurant instead. Each
+restaurant's info, menu and reviews are scraped (nothing is written to disk)
+and the script exits non-zero if any of them came back empty:
+
+    python benchmarks/smoke_scrape_stub.py --synthetic
+    python benchmarks/smoke_scrape_stub.py --pages-dir saved_pages
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import threading
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYNTHETIC_URL = 'https://www.zomato.com/bangalore/synthetic-diner-indiranagar'
+
+
+def write_synthetic_pages(pages_dir, url=SYNTHETIC_URL):
+    """Info, order and review pages for one restaurant, shaped like Zomato's"""
+    from stub_server import save_page
+    from bench_page_extract import synthetic_page
+    restaurant = {
+        "@type": "Restaurant", "name": "Synthetic Diner", "url": url,
+        "address": {"streetAddress": "1 Test Road", "addressLocality": "Indiranagar"},
+        "servesCuisine": "Cafe", "priceRange": "Rs 500 for two",
+        "aggregateRating": {"ratingValue": "4.2", "ratingCount": "120"},
+        "reviews": [{"author": f"Guest {i}", "url": f"{url}/review/{i}", "description": f"Visit {i} was good",
+                     "reviewRating": {"ratingValue": 4}} for i in range(5)]
+    }
+    page = ('<html><head><title>Synthetic Diner, Indiranagar, Bangalore | Zomato</title>'
+            f'<script type="application/ld+json">{json.dumps(restaurant)}</script></head><body></body></html>')
+    save_page(url, page, pages_dir)
+    save_page(url + '/order', synthetic_page(20), pages_dir)
+    # Every review page repeats the same reviews, which is where the review scraper stops
+    for i in range(1, 3):
+        save_page(url + f'/reviews?page={i}&sort=rd', page.replace('| Zomato', 'User Reviews | Zomato'), pages_dir)
+    return [url]
+
+
+def scrape_through_stub(urls, pages_dir):
+    """{url: (info name, menu rows, review rows)} for each URL, fetched from a stub server"""
+    from stub_server import start_server
+    from scrape_engine import ScrapeClient
+    from info_scraper import get_restaurant_info
+    from menu_scraper import get_menu
+    from review_scraper import get_reviews
+
+    server = start_server(pages_dir)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    stub_urls = [base + urlsplit(url).path.rstrip('/') for url in urls]
+    try:
+        with ScrapeClient(rate=100.0, burst=100, retries=0) as client:
+            info = get_restaurant_info(stub_urls, save=False, client=client)
+            return {
+                url: (info['Name'][i], len(get_menu(stub_url, save=False, client=client)),
+                      len(get_reviews(stub_url, max_reviews=50, save=False, client=client)))
+                for i, (url, stub_url) in enumerate(zip(urls, stub_urls))
+            }
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages-dir', default='saved_pages')
+    parser.add_argument('--urls', nargs='+', help="Restaurant URLs whose pages were saved (default: main.py's list)")
+    parser.add_argument('--synthetic', action='store_true', help="Serve one synthetic restaurant instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.synthetic:
+            pages_dir = tmp_dir
+            urls = write_synthetic_pages(pages_dir)
+        else:
+            from main import RESTAURANT_URLS
+            pages_dir = args.pages_dir
+            urls = args.urls or RESTAURANT_URLS
+        results = scrape_through_stub(urls, pages_dir)
+
+    failed = 0
+    for url, (name, menu_rows, review_rows) in results.items():
+        ok = isinstance(name, str) and menu_rows > 0 and review_rows > 0
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {url}: name {name!r}, {menu_rows} menu items, {review_rows} reviews")
+    print(f"{len(results) - failed}/{len(results)} restaurants scraped through the stub server")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import re
+import math
+from array import array
+from collections import Counter
+import numpy as np
+
+BM25_INDEX_PATH = 'knowledge_base/bm25_index.npz'
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def reciprocal_rank_fusion(rankings, top_k, k=60):
+    """Fuse ranked lists of (position, score) pairs; returns (position, fused score) pairs"""
+    fused = {}
+    for ranking in rankings:
+        for rank, (position, _) in enumerate(ranking):
+            fused[position] = fused.get(position, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+class BM25Index:
+    """Array-backed BM25 index over document contents.
+
+    Postings are stored CSR-style: for term id t, `doc_ids[indptr[t]:indptr[t+1]]`
+    are the documents containing it and `weights` the matching precomputed
+    BM25 term weights, so a query is a handful of slices and one bincount.
+    """
+
+    def __init__(self, terms, indptr, doc_ids, weights, num_docs):
+        self.terms = terms
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.num_docs = int(num_docs)
+        self.vocab = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def build(cls, documents, k1=1.5, b=0.75):
+        """Build the index from document contents.
+
+        `documents` is read once and can be a stream; postings are collected
+        in flat typed arrays, so building takes little more memory than the
+        finished index.
+        """
+        vocab = {}
+        term_ids, tfs, lengths, doc_terms = array('i'), array('f'), array('f'), array('i')
+        for doc in documents:
+            counts = Counter(tokenize(doc["content"]))
+            lengths.append(sum(counts.values()))
+            doc_terms.append(len(counts))
+            term_ids.extend(vocab.setdefault(term, len(vocab)) for term in counts)
+            tfs.extend(counts.values())
+        num_docs = len(lengths)
+        lengths = np.frombuffer(lengths, dtype='float32')
+        avg_length = float(lengths.mean()) if num_docs else 0.0
+
+        # Renumber terms in sorted order; a stable sort keeps every posting list in document order
+        terms = sorted(vocab)
+        rank = np.empty(len(terms), dtype='int32')
+        rank[[vocab[term] for term in terms]] = np.arange(len(terms), dtype='int32')
+        # Temporaries are dropped as soon as possible: they are as large as the index itself
+        term_ranks = rank[np.frombuffer(term_ids, dtype=np.intc)]
+        del term_ids
+        df = np.bincount(term_ranks, minlength=len(terms))
+        order = np.argsort(term_ranks, kind='stable')
+        del term_ranks
+        doc_ids = np.repeat(np.arange(num_docs, dtype='int32'), np.frombuffer(doc_terms, dtype=np.intc))[order]
+        tf = np.frombuffer(tfs, dtype='float32')[order]
+        del tfs, order
+
+        indptr = np.zeros(len(terms) + 1, dtype='int64')
+        np.cumsum(df, out=indptr[1:])
+        idf = np.array([math.log(1 + (num_docs - n + 0.5) / (n + 0.5)) for n in df.tolist()], dtype='float32')
+        # idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length)), in place
+        denominator = lengths[doc_ids]
+        denominator *= b
+        denominator /= max(avg_length, 1e-9)
+        denominator += 1 - b
+        denominator *= k1
+        denominator += tf
+        weights = np.repeat(idf, df)
+        weights *= tf
+        weights *= k1 + 1
+        weights /= denominator
+
+        return cls(np.array(terms), indptr, doc_ids, weights, num_docs)
+
+    def save(self, path=BM25_INDEX_PATH):
+        np.savez(path, terms=self.terms, indptr=self.indptr, doc_ids=self.doc_ids,
+                 weights=self.weights, num_docs=self.num_docs)
+
+    @classmethod
+    def load(cls, path=BM25_INDEX_PATH):
+        data = np.load(path)
+        return cls(data["terms"], data["indptr"], data["doc_ids"], data["weights"], data["num_docs"])
+
+    def search(self, query, top_k, mask=None):
+        """Return up to top_k (position, score) pairs, optionally restricted by a boolean mask"""
+        term_ids = [self.vocab[token] for token in tokenize(query) if token in self.vocab]
+        if not term_ids:
+            return []
+        spans = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        scores = np.bincount(
+            np.concatenate([self.doc_ids[span] for span in spans]),
+            weights=np.concatenate([self.weights[span] for span in spans]),
+            minlength=self.num_docs
+        )
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.count_nonzero(scores)
+        if matched == 0:
+            return []
+        k = min(top_k, matched)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(position), float(scores[position])) for position in top]
@@ -1,10 +1,16 @@
 import os
 import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from tqdm import tqdm
+from document_shards import ShardWriter, SHARD_DIR
 from data_utils import clean_text, extract_price_value, categorize_price_range, get_restaurant_files
 
+PRICE_RE = r'Rs\s*(\d+(?:\.\d+)?)'
+
 def load_restaurant_data():
     """Load all restaurant data from CSV files"""
     files = get_restaurant_files()
@@ -178,20 +184,302 @@ def create_restaurant_documents(knowledge_base):
     
     return documents
 
-def main():
+# --- Columnar build ---
+#
+# Same output as load_restaurant_data + create_restaurant_documents, but menus
+# and reviews are loaded into one frame per chunk of restaurants and every
+# field and document text is computed with vectorized column operations.
+
+# Column -> default when a CSV lacks it entirely (the row.get defaults)
+MENU_COLUMNS = {'Name': None, 'Description': '', 'Standard_Category': '', 'Price': '',
+                'Dietary_Info': 'Unknown', 'Tags': ''}
+REVIEW_COLUMNS = {'Author': '', 'Rating': '', 'Description': None}
+
+def _read_columns(path, defaults):
+    """Read a CSV as object columns, filling absent columns with their defaults"""
+    df = pd.read_csv(path)
+    if 'Standard_Category' in defaults and 'Standard_Category' not in df.columns:
+        df['Standard_Category'] = df['Category'] if 'Category' in df.columns else ''
+    for column, default in defaults.items():
+        if column not in df.columns:
+            df[column] = default
+    # Object dtype per file, so concatenating never upcasts ints to floats
+    return df[list(defaults)].astype(object)
+
+def _read_frames(paths, defaults):
+    """One frame for a chunk's CSVs, with a `restaurant_pos` column for the owning restaurant"""
+    positions = [pos for pos, path in enumerate(paths) if path]
+    if not positions:
+        return pd.DataFrame({column: [] for column in [*defaults, 'restaurant_pos']}, dtype=object)
+    frame = pd.concat([_read_columns(paths[pos], defaults) for pos in positions],
+                      keys=positions, names=['restaurant_pos', None])
+    return frame.reset_index(level=0).reset_index(drop=True)
+
+def _has_value(values):
+    """Vectorized `not pd.isna(v) and v`"""
+    return values.notna() & values.astype(bool)
+
+def _text(values):
+    """Vectorized f"{v}" for object columns"""
+    return values.astype(object).map(str)
+
+def _price_columns(prices):
+    """Vectorized extract_price_value and categorize_price_range"""
+    extracted = prices.astype(object).where(prices.map(type) == str).str.extract(PRICE_RE, expand=False)
+    values = extracted.astype(float).to_numpy()
+    missing = np.isnan(values)
+    price_values = values.astype(object)
+    price_values[missing] = None
+    price_categories = np.select(
+        [missing, values <= 200, values <= 500, values <= 800],
+        ["Unknown", "Budget", "Moderate", "Premium"],
+        "Luxury"
+    )
+    return price_values.tolist(), [str(category) for category in price_categories]
+
+def _build_restaurant_chunk(chunk):
+    """Build knowledge base entries and documents for a list of (restaurant, menu path, review path)"""
+    restaurants = [restaurant for restaurant, _, _ in chunk]
+
+    names = np.array([restaurant['name'] for restaurant in restaurants], dtype=object)
+
+    menu = _read_frames([menu_path for _, menu_path, _ in chunk], MENU_COLUMNS)
+    menu = menu[_has_value(menu['Name'])]
+    menu = pd.DataFrame({
+        "name": menu['Name'], "description": menu['Description'], "category": menu['Standard_Category'],
+        "price": menu['Price'], "dietary_info": menu['Dietary_Info'], "tags": menu['Tags'],
+        "restaurant": names[menu['restaurant_pos'].to_numpy(dtype=int)],
+        "restaurant_pos": menu['restaurant_pos']
+    }).reset_index(drop=True)
+
+    review = _read_frames([review_path for _, _, review_path in chunk], REVIEW_COLUMNS)
+    review = review[_has_value(review['Description'])]
+    review = pd.DataFrame({
+        "author": review['Author'], "rating": review['Rating'],
+        # Vectorized clean_text
+        "text": _text(review['Description'])
+                .str.normalize('NFKD')
+                .str.replace(r'\s+', ' ', regex=True).str.strip()
+                .str.replace(r'[^\w\s.,;?!-]', '', regex=True),
+        "restaurant_pos": review['restaurant_pos']
+    }).reset_index(drop=True)
+
+    # Per-item fields and document text, computed column-wise
+    price_values, price_categories = _price_columns(menu["price"])
+    name, description, category = _text(menu["name"]), _text(menu["description"]), _text(menu["category"])
+    price, dietary, tags, restaurant = _text(menu["price"]), _text(menu["dietary_info"]), _text(menu["tags"]), _text(menu["restaurant"])
+    item_ids = ("menu-item-" + restaurant + "-" + name).str.replace(' ', '-', regex=False).str.lower()
+    item_contents = (
+        "Restaurant: " + restaurant + "\nMenu item: " + name + "\nDescription: " + description +
+        "\nCategory: " + category + "\nPrice: " + price + "\nDietary info: " + dietary + "\nTags: " + tags
+    )
+    item_lines = (
+        "- " + name + ": " + description + " Price: " + price + ". " +
+        "Dietary info: " + dietary + ". Tags: " + tags
+    )
+
+    # Category documents: one groupby in first-appearance order
+    category_groups = (
+        menu.assign(line=item_lines)
+        .groupby(["restaurant_pos", "category"], sort=False, dropna=False)["line"]
+        .agg(["\n".join, "size"])
+    )
+    category_docs = [[] for _ in chunk]
+    for (pos, item_category), (items_text, item_count) in zip(category_groups.index, category_groups.to_numpy()):
+        label = item_category if item_category else "Uncategorized"
+        restaurant_name = restaurants[pos]['name']
+        category_docs[pos].append({
+            "id": f"menu-{restaurant_name}-{label}".replace(' ', '-').lower(),
+            "content": f"Restaurant: {restaurant_name}\n"
+                       f"Menu category: {label}\n"
+                       f"Items:\n{items_text}",
+            "metadata": {
+                "type": "menu_category",
+                "restaurant": restaurant_name,
+                "category": label,
+                "item_count": int(item_count)
+            }
+        })
+
+    # Knowledge base entries and item documents, split back out per restaurant
+    columns = [menu[c].tolist() for c in ("name", "description", "category", "price", "dietary_info", "tags")]
+    menu_rows = list(zip(*columns, price_values, price_categories, item_ids.tolist(), item_contents.tolist()))
+    review_rows = list(zip(review["author"].tolist(), review["rating"].tolist(), review["text"].tolist()))
+    menu_positions = menu.groupby("restaurant_pos", sort=False).indices
+    review_positions = review.groupby("restaurant_pos", sort=False).indices
+
+    knowledge_base = []
+    documents = []
+    for pos, restaurant_data in enumerate(restaurants):
+        restaurant_name = restaurant_data['name']
+        rows = [menu_rows[i] for i in menu_positions.get(pos, [])]
+        restaurant_data["menu_items"] = [
+            {"name": n, "description": d, "category": c, "price": p, "price_value": pv,
+             "price_category": pc, "dietary_info": di, "tags": t, "restaurant": restaurant_name}
+            for n, d, c, p, di, t, pv, pc, _, _ in rows
+        ]
+        restaurant_data["reviews"] = [
+            {"author": a, "rating": r, "text": t, "restaurant": restaurant_name}
+            for a, r, t in (review_rows[i] for i in review_positions.get(pos, []))
+        ]
+        knowledge_base.append(restaurant_data)
+
+        documents.append(_restaurant_info_document(restaurant_data))
+        documents.extend(category_docs[pos])
+        documents.extend(
+            {
+                "id": item_id,
+                "content": content,
+                "metadata": {
+                    "type": "menu_item",
+                    "restaurant": restaurant_name,
+                    "name": n,
+                    "category": c,
+                    "price_value": pv,
+                    "price_category": pc,
+                    "dietary_info": di
+                }
+            }
+            for n, d, c, p, di, t, pv, pc, item_id, content in rows
+        )
+        if restaurant_data["reviews"]:
+            documents.append(_reviews_document(restaurant_data))
+
+    return knowledge_base, documents
+
+def _restaurant_info_document(restaurant):
+    return {
+        "id": f"restaurant-{restaurant['name'].replace(' ', '-').lower()}",
+        "content": f"Restaurant: {restaurant['name']}\n"
+                  f"Cuisine: {restaurant['basic_info']['cuisine']}\n"
+                  f"Location: {restaurant['basic_info']['location']}\n"
+                  f"Price range: {restaurant['basic_info']['price_range']}\n"
+                  f"Opening hours: {restaurant['basic_info']['opening_hours']}\n"
+                  f"Rating: {restaurant['basic_info']['rating']} from {restaurant['basic_info']['rating_count']} reviews\n"
+                  f"Phone: {restaurant['basic_info']['phone']}",
+        "metadata": {
+            "type": "restaurant_info",
+            "restaurant": restaurant['name'],
+            "cuisine": restaurant['basic_info']['cuisine'],
+            "location": restaurant['basic_info']['location'],
+            "price_range": restaurant['basic_info']['price_range']
+        }
+    }
+
+def _reviews_document(restaurant):
+    reviews_text = "\n".join([
+        f"- {review['author']} (Rating: {review['rating']}): {review['text']}"
+        for review in restaurant['reviews'][:10]  # Limit to 10 reviews per document
+    ])
+    return {
+        "id": f"reviews-{restaurant['name']}".replace(' ', '-').lower(),
+        "content": f"Restaurant: {restaurant['name']}\n"
+                  f"Reviews:\n{reviews_text}",
+        "metadata": {
+            "type": "reviews",
+            "restaurant": restaurant['name'],
+            "review_count": len(restaurant['reviews'])
+        }
+    }
+
+def restaurant_entry(restaurant):
+    """Knowledge base entry (without menu items and reviews) for a Restaurants.csv record"""
+    return {
+        "name": restaurant['Name'],
+        "type": "restaurant",
+        "basic_info": {
+            "cuisine": restaurant.get('Cuisine', ''),
+            "location": restaurant.get('Locality', ''),
+            "price_range": restaurant.get('Price_Range', ''),
+            "opening_hours": restaurant.get('Opening_Hours', ''),
+            "phone": restaurant.get('Phone', ''),
+            "rating": restaurant.get('Rating', ''),
+            "rating_count": restaurant.get('Rating_Count', '')
+        },
+        "menu_items": [],
+        "reviews": []
+    }
+
+def build_restaurant_documents(restaurant, menu_path, review_path):
+    """(knowledge base entry, documents) for one Restaurants.csv record and its menu and review files"""
+    knowledge_base, documents = _build_restaurant_chunk([(restaurant_entry(restaurant), menu_path, review_path)])
+    return knowledge_base[0], documents
+
+def iter_knowledge_base_chunks(workers=None, chunk_size=250):
+    """Yield (knowledge_base, documents) per chunk of restaurants, in Restaurants.csv order.
+
+    Chunks are built in parallel, but at most two per worker are in flight
+    at a time, so memory does not grow with the number of restaurants when
+    the consumer writes each chunk out as it arrives.
+    """
+    files = get_restaurant_files()
+    restaurants = pd.read_csv(files['restaurants']).astype(object).to_dict('records')
+
+    def chunks():
+        for i in range(0, len(restaurants), chunk_size):
+            yield [(restaurant_entry(restaurant), files['menus'].get(restaurant['Name']),
+                    files['reviews'].get(restaurant['Name'])) for restaurant in restaurants[i:i + chunk_size]]
+
+    num_chunks = -(-len(restaurants) // chunk_size)
+    if workers == 1 or num_chunks <= 1:
+        yield from map(_build_restaurant_chunk, chunks())
+        return
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks():
+            pending.append(executor.submit(_build_restaurant_chunk, chunk))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def build_knowledge_base_columnar(workers=None, chunk_size=250):
+    """Build (knowledge_base, documents) with vectorized column ops, chunks of restaurants in parallel"""
+    knowledge_base = []
+    documents = []
+    for chunk_knowledge_base, chunk_documents in tqdm(iter_knowledge_base_chunks(workers, chunk_size),
+                                                      desc="Processing restaurant chunks"):
+        knowledge_base.extend(chunk_knowledge_base)
+        documents.extend(chunk_documents)
+    return knowledge_base, documents
+
+def write_knowledge_base_shards(workers=None, shard_dir=SHARD_DIR, chunk_size=250):
+    """Stream the knowledge base and documents into JSONL shards; returns (restaurants, documents) written"""
+    with ShardWriter(shard_dir) as writer:
+        for chunk_knowledge_base, chunk_documents in tqdm(iter_knowledge_base_chunks(workers, chunk_size),
+                                                          desc="Writing restaurant chunks"):
+            for restaurant in chunk_knowledge_base:
+                writer.add_restaurant(restaurant)
+            for document in chunk_documents:
+                writer.add_document(document)
+    return writer.num_restaurants, sum(shard["num_documents"] for shard in writer.shards)
+
+def main(row_wise=False, workers=None, stream=False):
     # Create directories if they don't exist
     os.makedirs('knowledge_base', exist_ok=True)
     
+    if stream:
+        print("Building knowledge base shards...")
+        num_restaurants, num_documents = write_knowledge_base_shards(workers=workers)
+        print(f"Knowledge base built successfully with {num_restaurants} restaurants and {num_documents} document chunks.")
+        print(f"Files saved to {SHARD_DIR}/")
+        return
+    
     print("Building knowledge base...")
-    knowledge_base = load_restaurant_data()
+    if row_wise:
+        knowledge_base = load_restaurant_data()
+    else:
+        knowledge_base, documents = build_knowledge_base_columnar(workers=workers)
     
     # Save complete knowledge base
     with open('knowledge_base/restaurant_data.json', 'w', encoding='utf-8') as f:
         json.dump(knowledge_base, f, indent=2, ensure_ascii=False)
     
     # Create document chunks for RAG
-    print("Creating document chunks for retrieval...")
-    documents = create_restaurant_documents(knowledge_base)
+    if row_wise:
+        print("Creating document chunks for retrieval...")
+        documents = create_restaurant_documents(knowledge_base)
     
     # Save documents
     with open('knowledge_base/documents.json', 'w', encoding='utf-8') as f:
@@ -201,4 +489,10 @@ def main():
     print("Files saved to knowledge_base/restaurant_data.json and knowledge_base/documents.json")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build the restaurant knowledge base and retrieval documents")
+    parser.add_argument('--row-wise', action='store_true', help="Use the original row-by-row builder")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for the columnar builder")
+    parser.add_argument('--stream', action='store_true',
+                        help=f"Write JSONL shards to {SHARD_DIR} as chunks finish instead of two JSON files")
+    args = parser.parse_args()
+    main(row_wise=args.row_wise, workers=args.workers, stream=args.stream)
@@ -0,0 +1,134 @@
+from rag_cache import LRUCache
+from bm25_index import tokenize
+
+# flan-t5's encoder input limit
+MAX_INPUT_TOKENS = 512
+# Documents whose distinctive words are (almost) all in the context already are dropped. On the
+# shipped data an item doc is fully covered by its category doc, while two different items of
+# one restaurant share at most ~92% of theirs
+DUPLICATE_THRESHOLD = 0.95
+# Field labels from the build_knowledge_base.py document templates, shared by every document
+LABEL_WORDS = frozenset(
+    "restaurant menu item items category description price rs dietary info tags cuisine location "
+    "range opening hours rating from reviews phone uncategorized".split()
+)
+# Question words too common to say which lines of a long document matter ("priced" comes from the
+# generated menu descriptions)
+STOP_WORDS = frozenset(
+    "a an the is are was be at of for in on to with and or what which who where how much many does do "
+    "did have has me about tell show give any some best good there it its i you we my your can could "
+    "would should under over below above than less more priced".split()
+)
+# Stop adding documents once less than this much budget is left
+MIN_DOC_TOKENS = 24
+# Allowance for the "\n\n" between documents
+SEPARATOR_TOKENS = 1
+# Conversation history gets at most this much of the window, newest lines first
+MAX_HISTORY_TOKENS = 128
+
+
+class ContextBudgeter:
+    """Assemble prompt context that fits the generator's input window.
+
+    Ranked documents are added in order until the token budget is spent.
+    Near-duplicates of what is already in the context are skipped (e.g. a
+    menu item whose category listing was picked first), comparing words
+    other than template labels and the restaurant name. A document too long
+    for the remaining budget keeps its header lines plus the list lines that
+    share words with the question, instead of being cut off wherever the
+    model's truncation happens to land. Each document is tokenized once,
+    and its per-line token counts and word sets are cached by id.
+    """
+
+    def __init__(self, tokenizer, build_prompt, max_input_tokens=MAX_INPUT_TOKENS,
+                 duplicate_threshold=DUPLICATE_THRESHOLD, cache_size=8192):
+        self.tokenizer = tokenizer
+        self.build_prompt = build_prompt
+        self.max_input_tokens = max_input_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.documents = LRUCache(maxsize=cache_size)
+
+    def count(self, text):
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def _lines(self, doc):
+        """(lines, token count per line, word set per line) for a document, cached by id and content"""
+        key = (doc.get("id"), doc["content"])
+        entry = self.documents.get(key)
+        if entry is None:
+            lines = doc["content"].split("\n")
+            counts = [len(ids) for ids in self.tokenizer(lines, add_special_tokens=False)["input_ids"]]
+            # Labels and the restaurant's own name say nothing about which document this is
+            common = LABEL_WORDS | frozenset(tokenize(doc.get("metadata", {}).get("restaurant", "")))
+            entry = (lines, counts, [frozenset(tokenize(line)) - common for line in lines])
+            self.documents.put(key, entry)
+        return entry
+
+    def _fit(self, lines, counts, words, question_words, budget):
+        """Indices of the lines to keep within budget.
+
+        Header lines come first, then list lines ("- ...") by how many words
+        they share with the question. Unrelated list lines are only used when
+        none match, so a long listing leaves room for the next documents.
+        """
+        headers = [i for i, line in enumerate(lines) if not line.startswith("- ")]
+        overlap = {i: len(words[i] & question_words) for i in range(len(lines)) if lines[i].startswith("- ")}
+        matching = sorted((i for i in overlap if overlap[i]), key=lambda i: (-overlap[i], i))
+        order = headers + (matching or sorted(overlap))
+        keep, used = [], 0
+        for i in order:
+            if used + counts[i] <= budget:
+                keep.append(i)
+                used += counts[i]
+        return sorted(keep), used
+
+    def history(self, lines, max_tokens=MAX_HISTORY_TOKENS):
+        """The newest history lines that fit in max_tokens, joined oldest first (None when empty)"""
+        keep, used = [], 0
+        for line in reversed(lines):
+            count = self.count(line) + SEPARATOR_TOKENS
+            if used + count > max_tokens:
+                break
+            keep.append(line)
+            used += count
+        return "\n".join(reversed(keep)) or None
+
+    def _truncate_tokens(self, text, budget):
+        ids = self.tokenizer(text, add_special_tokens=False)["input_ids"][:budget]
+        return self.tokenizer.decode(ids, skip_special_tokens=True), len(ids)
+
+    def assemble(self, question, docs, history=None):
+        """Context strings for the prompt, chosen from `docs` (document dicts in ranked order)"""
+        # Template, history, question and end-of-sequence token come out of the budget first
+        budget = self.max_input_tokens - self.count(self.build_prompt(question, [], history)) - 1
+        question_words = frozenset(tokenize(question)) - LABEL_WORDS - STOP_WORDS
+        # Only documents of the same restaurant can duplicate each other
+        context, seen_words = [], {}
+
+        for doc in docs:
+            if budget < MIN_DOC_TOKENS:
+                break
+            lines, counts, words = self._lines(doc)
+            doc_words = frozenset().union(*words)
+            seen = seen_words.setdefault(doc.get("metadata", {}).get("restaurant"), set())
+            if doc_words and len(doc_words & seen) >= self.duplicate_threshold * len(doc_words):
+                continue
+
+            if sum(counts) <= budget:
+                text, used, kept_words = doc["content"], sum(counts), doc_words
+            else:
+                keep, used = self._fit(lines, counts, words, question_words, budget)
+                if keep:
+                    text = "\n".join(lines[i] for i in keep)
+                    kept_words = frozenset().union(*(words[i] for i in keep))
+                else:
+                    # Not even one line fits: hard-cut the first line
+                    text, used = self._truncate_tokens(lines[0], budget)
+                    kept_words = frozenset(tokenize(text)) & doc_words
+            context.append(text)
+            seen |= kept_words
+            budget -= used + SEPARATOR_TOKENS
+        return context
+
+    def stats(self):
+        return self.documents.stats()
@@ -0,0 +1,113 @@
+import re
+import time
+import threading
+from collections import OrderedDict, deque
+from bm25_index import tokenize
+from context_budget import LABEL_WORDS, STOP_WORDS
+
+# Recent turns kept verbatim per session; older ones are folded into the summary
+MAX_TURNS = 4
+# Distinct topic words the summary of older turns keeps
+SUMMARY_TERMS = 12
+# Sessions unused for this long are dropped
+SESSION_IDLE_SECONDS = 30 * 60
+# Hard cap on live sessions; the least recently used are dropped first
+MAX_SESSIONS = 10000
+# Words that make a question lean on an earlier one ("what about desserts there?")
+FOLLOW_UP_RE = re.compile(
+    r"\b(there|that|those|these|it|its|they|them|their|same|also|else|another|other)\b|^\s*(what|how) about\b",
+    re.IGNORECASE
+)
+
+
+def is_follow_up(question):
+    return bool(FOLLOW_UP_RE.search(question))
+
+
+class Session:
+    """One conversation: a ring buffer of recent turns plus a compact summary of older ones"""
+
+    def __init__(self, max_turns=MAX_TURNS):
+        self.turns = deque(maxlen=max_turns)
+        self.topics = OrderedDict()
+        # Restaurant filter of the last question that named one, applied to follow-ups
+        self.focus = None
+        self.last_used = time.monotonic()
+
+    def add(self, question, answer, filters=None):
+        if len(self.turns) == self.turns.maxlen:
+            self._summarize(self.turns[0][0])
+        self.turns.append((question, answer))
+        if filters and filters.get('restaurant'):
+            self.focus = filters['restaurant']
+
+    def _summarize(self, question):
+        """Keep the topic words of a turn leaving the buffer, newest last"""
+        for word in tokenize(question):
+            if word not in STOP_WORDS and word not in LABEL_WORDS and len(word) > 2:
+                self.topics.pop(word, None)
+                self.topics[word] = None
+        while len(self.topics) > SUMMARY_TERMS:
+            self.topics.popitem(last=False)
+
+    def history_lines(self):
+        """Prompt lines for this session, oldest first"""
+        lines = []
+        if self.topics:
+            lines.append(f"Earlier topics: {', '.join(self.topics)}")
+        for question, answer in self.turns:
+            lines.append(f"User: {question}")
+            lines.append(f"Assistant: {answer}")
+        return lines
+
+
+class ConversationMemory:
+    """Per-session conversation state with a bounded footprint.
+
+    Each session keeps its last `max_turns` turns; older turns survive only
+    as a few topic words. Sessions idle for `idle_seconds` are evicted on
+    the next access, and at most `max_sessions` are kept (least recently
+    used first out), so memory stays flat however long the process runs.
+    """
+
+    def __init__(self, max_turns=MAX_TURNS, idle_seconds=SESSION_IDLE_SECONDS, max_sessions=MAX_SESSIONS):
+        self.max_turns = max_turns
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Sessions are ordered by last use, so idle ones are all at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_used <= self.idle_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, session_id):
+        """The live session for this id, or None"""
+        with self._lock:
+            self._evict(time.monotonic())
+            return self._sessions.get(session_id)
+
+    def record(self, session_id, question, answer, filters=None):
+        with self._lock:
+            now = time.monotonic()
+            session = self._sessions.pop(session_id, None) or Session(self.max_turns)
+            session.add(question, answer, filters)
+            session.last_used = now
+            self._sessions[session_id] = session
+            self._evict(now)
+
+    def end(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        return {"sessions": len(self._sessions), "max_sessions": self.max_sessions, "evicted": self.evicted}
@@ -1,9 +1,30 @@
 import os
 import json
+import math
+import hashlib
+import time
+import argparse
 import numpy as np
 from tqdm import tqdm
 from sentence_transformers import SentenceTransformer
 import faiss
+from bm25_index import BM25Index, BM25_INDEX_PATH
+from doc_store import DocumentStore, DOC_STORE_DIR
+from document_shards import DocumentShards, SHARD_DIR
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw', 'sq8', 'sq_fp16', 'pq')
+# Index types that store lossy codes fetch this many candidates per result and re-score them
+# against embeddings.npy (on clustered MiniLM-sized vectors this restores recall@10 to ~0.96+)
+RESCORE_FACTORS = {'sq8': 2, 'ivf_pq': 8, 'pq': 8}
+INDEX_MANIFEST_PATH = 'knowledge_base/index_manifest.json'
+EMBEDDINGS_PATH = 'knowledge_base/embeddings.npy'
+INDEX_PATH = 'knowledge_base/faiss_index.bin'
+VECTOR_IDS_PATH = 'knowledge_base/vector_ids.npy'
+EMBEDDING_STATE_PATH = 'knowledge_base/embedding_state.json'
+# Documents encoded per model call when streaming into embeddings.npy
+EMBED_BATCH_SIZE = 4096
+# Vectors read from embeddings.npy at a time when adding to or searching over them
+VECTOR_CHUNK_SIZE = 65536
 
 def load_documents():
     """Load document chunks from JSON file"""
@@ -26,22 +47,422 @@ def create_embeddings(documents):
     
     return embeddings
 
-def build_faiss_index(embeddings):
+def _batches(documents, batch_size):
+    batch = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_to_file(documents, path=EMBEDDINGS_PATH, batch_size=EMBED_BATCH_SIZE):
+    """Encode documents in fixed-size batches, appending each to a memory-mapped .npy.
+
+    `documents` only needs len() and iteration (e.g. DocumentShards), and
+    only one batch of texts and vectors is in memory at a time. Returns the
+    finished file opened as a read-only memmap.
+    """
+    if len(documents) == 0:
+        raise ValueError("no documents to embed")
+    print("Loading model...")
+    model = SentenceTransformer('all-MiniLM-L6-v2')
+
+    print(f"Generating embeddings in batches of {batch_size}...")
+    embeddings = None
+    row = 0
+    for batch in tqdm(_batches(documents, batch_size), total=-(-len(documents) // batch_size)):
+        vectors = np.asarray(model.encode([doc["content"] for doc in batch]), dtype='float32')
+        if embeddings is None:
+            embeddings = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype='float32',
+                                                   shape=(len(documents), vectors.shape[1]))
+        embeddings[row:row + len(vectors)] = vectors
+        row += len(vectors)
+    if row != len(documents):
+        raise ValueError(f"expected {len(documents)} documents, read {row}")
+    embeddings.flush()
+    del embeddings
+    os.replace(path + '.tmp', path)
+    return np.load(path, mmap_mode='r')
+
+def default_index_params(index_type, num_vectors, dimension, overrides=None):
+    """Pick build and search parameters that suit the corpus size"""
+    params = {}
+    if index_type in ('ivf_flat', 'ivf_pq'):
+        # ~4*sqrt(n) lists, but keep enough training points per centroid
+        params['nlist'] = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39 or 1))
+        params['nprobe'] = max(1, params['nlist'] // 8)
+    if index_type in ('ivf_pq', 'pq'):
+        # Sub-quantizers of 8 dimensions each; fewer bits when there are too few vectors to train 256 centroids
+        params['m'] = next(m for m in range(max(1, dimension // 8), 0, -1) if dimension % m == 0)
+        params['nbits'] = max(1, min(8, int(math.log2(max(2, num_vectors // 39)))))
+    if index_type in RESCORE_FACTORS:
+        params['rescore_factor'] = RESCORE_FACTORS[index_type]
+    if index_type == 'hnsw':
+        params['M'] = 32
+        params['efConstruction'] = 80
+        params['efSearch'] = 64
+    params.update(overrides or {})
+    return params
+
+def _make_index(index_type, dimension, params):
+    if index_type == 'flat':
+        return faiss.IndexFlatL2(dimension)
+    if index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, params['M'])
+        index.hnsw.efConstruction = params['efConstruction']
+        return index
+    if index_type == 'sq8':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    if index_type == 'sq_fp16':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    if index_type == 'pq':
+        return faiss.IndexPQ(dimension, params['m'], params['nbits'], faiss.METRIC_L2)
+    quantizer = faiss.IndexFlatL2(dimension)
+    if index_type == 'ivf_flat':
+        return faiss.IndexIVFFlat(quantizer, dimension, params['nlist'], faiss.METRIC_L2)
+    if index_type == 'ivf_pq':
+        return faiss.IndexIVFPQ(quantizer, dimension, params['nlist'], params['m'], params['nbits'])
+    raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+def _base_index(index):
+    """Unwrap an IndexIDMap so type-specific attributes (e.g. hnsw) are reachable"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+def apply_search_params(index, params):
+    """Set query-time knobs (nprobe for IVF, efSearch for HNSW) on a loaded index"""
+    if params.get('nprobe') is not None:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = int(params['nprobe'])
+    base = _base_index(index)
+    if params.get('efSearch') is not None and hasattr(base, 'hnsw'):
+        base.hnsw.efSearch = int(params['efSearch'])
+    return index
+
+def replace_file(path, write):
+    """Write through a temporary file and rename it into place.
+
+    Readers that memory-map the old file (e.g. server workers) keep a valid
+    view instead of seeing it truncated underneath them.
+    """
+    tmp_path = path + '.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def write_index(index, path=INDEX_PATH):
+    replace_file(path, lambda tmp_path: faiss.write_index(index, tmp_path))
+
+def save_array(path, array):
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+    replace_file(path, write)
+
+def build_faiss_index(embeddings, index_type='flat', params=None, train_sample_size=50000, seed=42, ids=None):
     """Build a FAISS index for fast similarity search"""
     # Create FAISS index
-    print("Building FAISS index...")
-    dimension = embeddings.shape[1]  # Get the dimension of embeddings
-    index = faiss.IndexFlatL2(dimension)  # L2 distance (Euclidean)
+    print(f"Building FAISS index ({index_type})...")
+    num_vectors, dimension = np.shape(embeddings)  # Get the dimension of embeddings
+    params = default_index_params(index_type, num_vectors, dimension, params)
+    index = _make_index(index_type, dimension, params)
+
+    # IVF variants need their coarse quantizer (and PQ codebooks) trained first
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample_size = min(num_vectors, train_sample_size)
+        sample = np.ascontiguousarray(embeddings[rng.choice(num_vectors, sample_size, replace=False)], dtype='float32')
+        print(f"Training index on {sample_size} sampled vectors...")
+        index.train(sample)
     
-    # Add vectors to index
-    index.add(np.array(embeddings).astype('float32'))
+    # Add vectors to index in chunks (embeddings can be a memmap); explicit ids make the index
+    # updatable in place later
+    if ids is not None:
+        ids = np.asarray(ids, dtype='int64')
+        if faiss.try_extract_index_ivf(index) is None:
+            index = faiss.IndexIDMap2(index)
+    for start in range(0, num_vectors, VECTOR_CHUNK_SIZE):
+        chunk = np.ascontiguousarray(embeddings[start:start + VECTOR_CHUNK_SIZE], dtype='float32')
+        if ids is None:
+            index.add(chunk)
+        else:
+            index.add_with_ids(chunk, ids[start:start + len(chunk)])
+    apply_search_params(index, params)
     
     return index
 
-def main():
+def rescore(query_embeddings, indices, vectors, top_k):
+    """Re-rank candidate rows (-1 padded) by exact L2 distance to full-precision vectors.
+
+    `vectors` can be a memmap: only the candidate rows are read from disk.
+    Returns (distances, indices) like index.search, padded with -1.
+    """
+    distances = np.full((len(indices), top_k), np.inf, dtype='float32')
+    ranked = np.full((len(indices), top_k), -1, dtype='int64')
+    for i, (query, row) in enumerate(zip(query_embeddings, indices)):
+        candidates = np.unique(row[row >= 0])
+        if len(candidates) == 0:
+            continue
+        exact = ((np.asarray(vectors[candidates], dtype='float32') - query) ** 2).sum(axis=1)
+        order = np.argsort(exact)[:top_k]
+        distances[i, :len(order)] = exact[order]
+        ranked[i, :len(order)] = candidates[order]
+    return distances, ranked
+
+def exact_search(queries, vectors, k):
+    """Exact L2 (distances, indices) of the k nearest vectors, scanning `vectors` (e.g. a memmap) in chunks"""
+    heap = faiss.ResultHeap(len(queries), k)
+    for start in range(0, len(vectors), VECTOR_CHUNK_SIZE):
+        chunk = np.ascontiguousarray(vectors[start:start + VECTOR_CHUNK_SIZE], dtype='float32')
+        distances, indices = faiss.knn(queries, chunk, min(k, len(chunk)))
+        heap.add_result(distances, indices + start)
+    heap.finalize()
+    return heap.D, heap.I
+
+def evaluate_recall(index, embeddings, k=10, num_queries=200, seed=0, rescore_factor=0):
+    """Measure recall@k and per-query search time against exact search.
+
+    With a rescore_factor, k * rescore_factor candidates are fetched and
+    re-ranked against the full-precision embeddings, as the chatbot does.
+    """
+    rng = np.random.default_rng(seed)
+    queries = np.ascontiguousarray(
+        embeddings[rng.choice(len(embeddings), min(num_queries, len(embeddings)), replace=False)], dtype='float32'
+    )
+    k = min(k, len(embeddings))
+
+    start = time.perf_counter()
+    _, truth = exact_search(queries, embeddings, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    if rescore_factor:
+        _, candidates = index.search(queries, min(k * rescore_factor, len(embeddings)))
+        _, found = rescore(queries, candidates, embeddings, k)
+    else:
+        _, found = index.search(queries, k)
+    approx_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return {
+        "k": k,
+        "recall": hits / (len(queries) * k),
+        "num_queries": len(queries),
+        "rescore_factor": rescore_factor,
+        "exact_ms_per_query": exact_ms,
+        "index_ms_per_query": approx_ms
+    }
+
+def index_size_bytes(index):
+    return int(faiss.serialize_index(index).size)
+
+def compare_storage(embeddings, index_types=INDEX_TYPES, k=10):
+    """Build every index type over the same embeddings and report size, search time and recall@k"""
+    report = {}
+    for index_type in index_types:
+        params = default_index_params(index_type, *embeddings.shape)
+        index = build_faiss_index(embeddings, index_type=index_type, params=params)
+        report[index_type] = {
+            "size_bytes": index_size_bytes(index),
+            "recall": evaluate_recall(index, embeddings, k=k),
+            "rescored_recall": evaluate_recall(index, embeddings, k=k, rescore_factor=params['rescore_factor'])
+            if 'rescore_factor' in params else None
+        }
+
+    print(f"\nembeddings.npy (float32): {embeddings.nbytes / 2**20:.1f} MiB, kept on disk and memory-mapped")
+    print(f"{'index':<10}{'size MiB':>10}{'ms/query':>10}{'recall@' + str(k):>11}{'rescored':>10}"
+          f"{'ms/query':>10}{'recall@' + str(k):>11}")
+    for index_type, row in report.items():
+        plain, rescored = row["recall"], row["rescored_recall"]
+        line = (f"{index_type:<10}{row['size_bytes'] / 2**20:>10.2f}{plain['index_ms_per_query']:>10.3f}"
+                f"{plain['recall']:>11.3f}")
+        if rescored:
+            line += f"{str(rescored['rescore_factor']) + 'x':>10}{rescored['index_ms_per_query']:>10.3f}{rescored['recall']:>11.3f}"
+        print(line)
+    return report
+
+def save_index_manifest(index_type, params, index, recall=None, path=INDEX_MANIFEST_PATH):
+    """Write the index parameters next to faiss_index.bin so readers can apply them"""
+    manifest = {
+        "index_type": index_type,
+        "dimension": index.d,
+        "num_vectors": index.ntotal,
+        "size_bytes": index_size_bytes(index),
+        "params": params,
+        "recall": recall
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+def load_index_manifest(path=INDEX_MANIFEST_PATH):
+    """Load the sidecar manifest; indexes built before it existed are plain Flat"""
+    if not os.path.exists(path):
+        return {"index_type": "flat", "params": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def content_hash(document):
+    """Hash of the text that gets embedded; unchanged hashes can reuse their vector"""
+    return hashlib.sha1(document["content"].encode('utf-8')).hexdigest()
+
+def keyed_documents(documents):
+    """(key, document) pairs with stable per-document keys, disambiguating any repeated document ids"""
+    seen = {}
+    for doc in documents:
+        count = seen.get(doc["id"], 0)
+        seen[doc["id"]] = count + 1
+        yield (doc["id"] if count == 0 else f"{doc['id']}#{count}"), doc
+
+def document_keys(documents):
+    return [key for key, _ in keyed_documents(documents)]
+
+def save_embedding_state(documents, vector_ids, next_id, path=EMBEDDING_STATE_PATH):
+    """Record content hash, vector id and embeddings.npy row for every document"""
+    # Written entry by entry: documents can be streamed from shards
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'{{"next_id": {int(next_id)}, "documents": {{')
+        for row, ((key, doc), vector_id) in enumerate(zip(keyed_documents(documents), vector_ids)):
+            entry = {"hash": content_hash(doc), "vector_id": int(vector_id), "row": row}
+            f.write(f'{", " if row else ""}{json.dumps(key)}: {json.dumps(entry)}')
+        f.write('}}')
+
+def load_embedding_state(path=EMBEDDING_STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def update_embeddings(documents):
+    """Re-encode only added or changed documents and patch the id-mapped index in place.
+
+    Returns False when there is no usable previous build, in which case the
+    caller should fall back to a full rebuild.
+    """
+    state = load_embedding_state()
+    if state is None or not all(os.path.exists(p) for p in (EMBEDDINGS_PATH, INDEX_PATH, VECTOR_IDS_PATH)):
+        return False
+    manifest = load_index_manifest()
+    old_documents = state["documents"]
+    old_embeddings = np.load(EMBEDDINGS_PATH, mmap_mode='r')
+
+    keys = document_keys(documents)
+    embeddings = np.empty((len(documents), old_embeddings.shape[1]), dtype='float32')
+    vector_ids = np.empty(len(documents), dtype='int64')
+    next_id = state["next_id"]
+    to_encode = []
+    removed = []
+    reordered = False
+
+    for row, (key, doc) in enumerate(zip(keys, documents)):
+        entry = old_documents.get(key)
+        if entry is not None and entry["hash"] == content_hash(doc):
+            embeddings[row] = old_embeddings[entry["row"]]
+            vector_ids[row] = entry["vector_id"]
+            reordered = reordered or entry["row"] != row
+            continue
+        # Changed documents get a fresh vector id; their old vector is removed
+        if entry is not None:
+            removed.append(entry["vector_id"])
+        vector_ids[row] = next_id
+        next_id += 1
+        to_encode.append(row)
+
+    current = set(keys)
+    removed.extend(entry["vector_id"] for key, entry in old_documents.items() if key not in current)
+
+    if not to_encode and not removed and not reordered:
+        print("Embeddings are up to date, nothing to re-encode.")
+        return True
+    if removed and manifest.get("index_type") == 'hnsw':
+        print("HNSW indexes do not support removing vectors.")
+        return False
+
+    print(f"Incremental update: {len(to_encode)} to encode, {len(removed)} to remove, "
+          f"{len(documents) - len(to_encode)} reused.")
+    if to_encode:
+        embeddings[to_encode] = create_embeddings([documents[row] for row in to_encode])
+
+    index = faiss.read_index(INDEX_PATH)
+    if removed:
+        index.remove_ids(np.asarray(removed, dtype='int64'))
+    if to_encode:
+        index.add_with_ids(embeddings[to_encode], vector_ids[to_encode])
+
+    print("Saving embeddings and updated FAISS index...")
+    save_array(EMBEDDINGS_PATH, embeddings)
+    save_array(VECTOR_IDS_PATH, vector_ids)
+    write_index(index)
+    save_index_manifest(manifest.get("index_type", 'flat'), manifest.get("params", {}), index, manifest.get("recall"))
+    save_embedding_state(documents, vector_ids, next_id)
+    return True
+
+def build_sparse_index(documents):
+    """Build the BM25 index used alongside FAISS for exact-term matches"""
+    print("Building BM25 index...")
+    BM25Index.build(documents).save(BM25_INDEX_PATH)
+
+def build_document_store(documents):
+    """Write the memory-mapped document store the chatbot loads instead of documents.json"""
+    print("Writing document store...")
+    DocumentStore.write(documents, DOC_STORE_DIR)
+
+def build_indexes(documents, embeddings, index_type='flat', params=None, recall_k=10):
+    """Save embeddings and build every index the chatbot reads from them"""
+    # Streamed builds have written them already (embeddings is that file, memory-mapped)
+    if getattr(embeddings, 'filename', None) != os.path.abspath(EMBEDDINGS_PATH):
+        print("Saving embeddings...")
+        save_array(EMBEDDINGS_PATH, embeddings)
+    
+    # Build FAISS index; vector ids start out equal to document positions
+    vector_ids = np.arange(len(documents), dtype='int64')
+    params = default_index_params(index_type, *np.shape(embeddings), params)
+    index = build_faiss_index(embeddings, index_type=index_type, params=params, ids=vector_ids)
+
+    # Compare against exact search so the accuracy/latency trade-off is visible
+    recall = None
+    if index_type != 'flat':
+        recall = evaluate_recall(index, embeddings, k=recall_k, rescore_factor=params.get('rescore_factor', 0))
+        rescored = f", re-scoring {recall['rescore_factor']}x candidates" if recall['rescore_factor'] else ""
+        print(f"Recall@{recall['k']} vs Flat: {recall['recall']:.3f}{rescored} "
+              f"({recall['index_ms_per_query']:.3f} ms/query vs {recall['exact_ms_per_query']:.3f} ms/query exact)")
+    print(f"Index size: {index_size_bytes(index) / 2**20:.2f} MiB "
+          f"(float32 embeddings: {np.asarray(embeddings).nbytes / 2**20:.2f} MiB)")
+    
+    # Save index
+    print("Saving FAISS index...")
+    write_index(index)
+    save_array(VECTOR_IDS_PATH, vector_ids)
+    save_index_manifest(index_type, params, index, recall)
+    save_embedding_state(documents, vector_ids, len(documents))
+    build_sparse_index(documents)
+    build_document_store(documents)
+
+def main(index_type=None, params=None, recall_k=10, incremental=False, compare=False, stream=False):
+    """Build (or with `incremental`, update) the embeddings and indexes; index_type defaults to flat"""
     # Create directories if they don't exist
     os.makedirs('knowledge_base', exist_ok=True)
     
+    if stream:
+        if not DocumentShards.exists():
+            print("No document shards found. Run build_knowledge_base.py --stream first.")
+            return
+        # Documents, texts and vectors are streamed batch by batch; only the index itself grows in memory
+        documents = DocumentShards()
+        if len(documents) == 0:
+            print("No documents found. Run build_knowledge_base.py --stream first.")
+            return
+        print(f"Streaming {len(documents)} documents from {SHARD_DIR}...")
+        embeddings = embed_to_file(documents)
+        if compare:
+            compare_storage(embeddings, k=recall_k)
+        build_indexes(documents, embeddings, index_type or 'flat', params, recall_k)
+        print(f"Embeddings and index created successfully for {len(documents)} documents.")
+        print("Files saved to knowledge_base/embeddings.npy and knowledge_base/faiss_index.bin")
+        return
+    
     # Load documents
     print("Loading documents...")
     documents = load_documents()
@@ -49,23 +470,64 @@ def main():
     if not documents:
         print("No documents found. Run build_knowledge_base.py first.")
         return
+
+    if incremental:
+        # Updates keep the existing index type; it is also what a fallback rebuild uses
+        previous = load_index_manifest() if os.path.exists(INDEX_MANIFEST_PATH) else None
+        if previous is not None:
+            if index_type and index_type != previous["index_type"]:
+                print(f"Warning: ignoring --index-type {index_type}, incremental updates keep the existing "
+                      f"{previous['index_type']} index.")
+            index_type = previous["index_type"]
+            params = {**previous.get("params", {}), **(params or {})}
+        if update_embeddings(documents):
+            build_sparse_index(documents)
+            build_document_store(documents)
+            print(f"Embeddings and index updated for {len(documents)} documents.")
+            return
+        if previous is None:
+            print("No usable previous build, falling back to a full rebuild...")
+        else:
+            print(f"Falling back to a full rebuild of the {index_type} index...")
+    index_type = index_type or 'flat'
     
     # Create embeddings
     embeddings = create_embeddings(documents)
-    
-    # Save embeddings
-    print("Saving embeddings...")
-    np.save('knowledge_base/embeddings.npy', embeddings)
-    
-    # Build FAISS index
-    index = build_faiss_index(embeddings)
-    
-    # Save index
-    print("Saving FAISS index...")
-    faiss.write_index(index, 'knowledge_base/faiss_index.bin')
+    if compare:
+        compare_storage(embeddings, k=recall_k)
+    build_indexes(documents, embeddings, index_type, params, recall_k)
     
     print(f"Embeddings and index created successfully for {len(documents)} documents.")
     print("Files saved to knowledge_base/embeddings.npy and knowledge_base/faiss_index.bin")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Create embeddings and a FAISS index for the knowledge base")
+    parser.add_argument('--index-type', choices=INDEX_TYPES,
+                        help="Default flat; with --incremental the existing index's type is kept")
+    parser.add_argument('--nlist', type=int, help="IVF: number of inverted lists")
+    parser.add_argument('--nprobe', type=int, help="IVF: lists visited per query")
+    parser.add_argument('--m', type=int, help="IVF-PQ: number of sub-quantizers")
+    parser.add_argument('--nbits', type=int, help="IVF-PQ: bits per sub-quantizer code")
+    parser.add_argument('--hnsw-m', dest='M', type=int, help="HNSW: neighbours per node")
+    parser.add_argument('--ef-construction', dest='efConstruction', type=int, help="HNSW: build-time beam width")
+    parser.add_argument('--ef-search', dest='efSearch', type=int, help="HNSW: query-time beam width")
+    parser.add_argument('--rescore-factor', dest='rescore_factor', type=int,
+                        help="Candidates per result re-scored against full-precision embeddings (0 disables)")
+    parser.add_argument('--recall-k', type=int, default=10)
+    parser.add_argument('--compare-storage', action='store_true',
+                        help="Report size, search time and recall of every index type before building")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Re-encode only added or changed documents and update the index in place")
+    parser.add_argument('--stream', action='store_true',
+                        help=f"Read documents from the JSONL shards in {SHARD_DIR} and embed them batch by batch")
+    args = vars(parser.parse_args())
+    if args['stream'] and args['incremental']:
+        parser.error("--incremental works on documents.json and cannot be combined with --stream")
+
+    index_type = args.pop('index_type')
+    recall_k = args.pop('recall_k')
+    incremental = args.pop('incremental')
+    compare = args.pop('compare_storage')
+    stream = args.pop('stream')
+    main(index_type, {key: value for key, value in args.items() if value is not None}, recall_k, incremental,
+         compare, stream)
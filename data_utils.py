@@ -3,6 +3,7 @@ import unicodedata
 import pandas as pd
 import os
 import json
+from file_manifest import MANIFEST_PATH, load_manifest, manifest_from_files, resolve_files
 
 def clean_text(text):
     """Clean and normalize text for better processing."""
@@ -49,32 +50,37 @@ def categorize_price_range(price):
         return "Luxury"
 
 def get_restaurant_files():
-    """Get all restaurant data files from the different directories."""
+    """Get all restaurant data files from the different directories.
+
+    Files are looked up in the manifest the scrapers write (file_manifest.jsonl);
+    without one, existing files are matched to restaurants by name. Also
+    reports restaurants with missing files and files no restaurant claims.
+    """
     files = {
         'restaurants': 'Restaurants.csv',
         'menus': {},
-        'reviews': {}
+        'reviews': {},
+        'missing': {'menus': [], 'reviews': []},
+        'orphans': []
     }
     
-    # Get restaurant names from Restaurants.csv
-    if os.path.exists('Restaurants.csv'):
-        restaurants_df = pd.read_csv('Restaurants.csv')
-        restaurant_names = restaurants_df['Name'].tolist()
-        
-        # Find menu files for each restaurant
-        if os.path.exists('Enhanced_Menu'):
-            for filename in os.listdir('Enhanced_Menu'):
-                if filename.endswith('.csv'):
-                    for name in restaurant_names:
-                        if name in filename:
-                            files['menus'][name] = os.path.join('Enhanced_Menu', filename)
-        
-        # Find review files for each restaurant
-        if os.path.exists('Reviews'):
-            for filename in os.listdir('Reviews'):
-                if filename.endswith('.csv'):
-                    for name in restaurant_names:
-                        if name.replace(' ', '_') in filename:
-                            files['reviews'][name] = os.path.join('Reviews', filename)
+    if not os.path.exists('Restaurants.csv'):
+        return files
+    
+    restaurants_df = pd.read_csv('Restaurants.csv')
+    manifest = load_manifest()
+    if manifest is None:
+        print(f"No {MANIFEST_PATH} found; matching files by restaurant name "
+              f"(run `python file_manifest.py --rebuild` to save the mapping)")
+        manifest = manifest_from_files(restaurants_df)
+    
+    files['menus'], files['reviews'], files['missing'], files['orphans'] = resolve_files(restaurants_df, manifest)
+    
+    if files['missing']['menus']:
+        print(f"Warning: no menu file for {len(files['missing']['menus'])} restaurants: "
+              f"{', '.join(map(str, files['missing']['menus'][:10]))}")
+    if files['orphans']:
+        print(f"Warning: {len(files['orphans'])} files not linked to any restaurant: "
+              f"{', '.join(files['orphans'][:10])}")
     
     return files
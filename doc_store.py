@@ -0,0 +1,175 @@
+import os
+import json
+import shutil
+from array import array
+import numpy as np
+
+DOC_STORE_DIR = 'knowledge_base/doc_store'
+STORE_MANIFEST = 'store.json'
+
+
+def _blob(strings):
+    """Concatenated UTF-8 bytes and the int64 offsets delimiting each string"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='int64')
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return b''.join(encoded), offsets
+
+
+def _read_bytes(path):
+    """Memory-map a byte blob (empty files cannot be mapped)"""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype='uint8')
+    return np.memmap(path, dtype='uint8', mode='r')
+
+
+def encode_metadata(documents):
+    """Dictionary-encode metadata as {field: (int32 codes, values)}; code -1 means the field is absent"""
+    columns = {}
+    for position, doc in enumerate(documents):
+        for field, value in doc.get("metadata", {}).items():
+            if field not in columns:
+                columns[field] = (np.full(len(documents), -1, dtype='int32'), {})
+            codes, vocab = columns[field]
+            # Keyed by JSON form so 1 and 1.0, or None and NaN, stay distinct values
+            codes[position] = vocab.setdefault(json.dumps(value), len(vocab))
+    return {field: (codes, [json.loads(key) for key in vocab]) for field, (codes, vocab) in columns.items()}
+
+
+class DocumentStore:
+    """Read-only, memory-mapped knowledge base documents.
+
+    Contents and ids live in contiguous UTF-8 blobs with offset arrays and
+    metadata as dictionary-encoded columns, all mapped rather than read, so
+    worker processes on one host share the same page-cache pages.  Embeddings
+    are not duplicated here: the chatbot maps knowledge_base/embeddings.npy. Documents are decoded on access;
+    `store[i]` returns the same dict documents.json holds.
+    """
+
+    def __init__(self, path=DOC_STORE_DIR):
+        self.path = path
+        with open(os.path.join(path, STORE_MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.size = manifest["num_documents"]
+        self.fields = manifest["fields"]
+        self.field_values = manifest["values"]
+
+        self.texts = _read_bytes(os.path.join(path, 'texts.bin'))
+        self.text_offsets = np.load(os.path.join(path, 'text_offsets.npy'), mmap_mode='r')
+        self.ids = _read_bytes(os.path.join(path, 'ids.bin'))
+        self.id_offsets = np.load(os.path.join(path, 'id_offsets.npy'), mmap_mode='r')
+        self.id_order = np.load(os.path.join(path, 'id_order.npy'), mmap_mode='r')
+        self.metadata_codes = np.load(os.path.join(path, 'metadata_codes.npy'), mmap_mode='r')
+
+    @staticmethod
+    def write(documents, path=DOC_STORE_DIR):
+        """Write documents as a store.
+
+        The store is built in a sibling directory and swapped in whole, so
+        processes that have the previous store mapped keep reading valid files.
+        """
+        final_path, path = path, path.rstrip('/\\') + '.tmp'
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+        # One pass over `documents`, so it can be a stream (e.g. DocumentShards): contents go straight
+        # to texts.bin, metadata codes are collected per field as (positions, codes, vocab)
+        ids = []
+        text_offsets = array('q', [0])
+        columns = {}
+        with open(os.path.join(path, 'texts.bin'), 'wb') as texts:
+            for position, doc in enumerate(documents):
+                encoded = doc["content"].encode('utf-8')
+                texts.write(encoded)
+                text_offsets.append(text_offsets[-1] + len(encoded))
+                ids.append(str(doc["id"]))
+                for field, value in doc.get("metadata", {}).items():
+                    if field not in columns:
+                        columns[field] = (array('q'), array('i'), {})
+                    positions, field_codes, vocab = columns[field]
+                    # Keyed by JSON form so 1 and 1.0, or None and NaN, stay distinct values
+                    positions.append(position)
+                    field_codes.append(vocab.setdefault(json.dumps(value), len(vocab)))
+        num_documents = len(ids)
+        np.save(os.path.join(path, 'text_offsets.npy'), np.frombuffer(text_offsets, dtype='int64'))
+        blob, offsets = _blob(ids)
+        with open(os.path.join(path, 'ids.bin'), 'wb') as f:
+            f.write(blob)
+        np.save(os.path.join(path, 'id_offsets.npy'), offsets)
+        np.save(os.path.join(path, 'id_order.npy'),
+                np.array(sorted(range(num_documents), key=ids.__getitem__), dtype='int64'))
+
+        fields = list(columns)
+        codes = np.full((num_documents, len(fields)), -1, dtype='int32')
+        for j, (positions, field_codes, _) in enumerate(columns.values()):
+            codes[np.frombuffer(positions, dtype='int64'), j] = np.frombuffer(field_codes, dtype='int32')
+        np.save(os.path.join(path, 'metadata_codes.npy'), codes)
+        values = [[json.loads(key) for key in vocab] for _, _, vocab in columns.values()]
+
+        with open(os.path.join(path, STORE_MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump({
+                "num_documents": num_documents,
+                "fields": fields,
+                "values": values
+            }, f, ensure_ascii=False)
+
+        old_path = final_path.rstrip('/\\') + '.old'
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(final_path):
+            os.rename(final_path, old_path)
+        os.rename(path, final_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @staticmethod
+    def exists(path=DOC_STORE_DIR):
+        return os.path.exists(os.path.join(path, STORE_MANIFEST))
+
+    def __len__(self):
+        return self.size
+
+    def content(self, position):
+        start, end = self.text_offsets[position], self.text_offsets[position + 1]
+        return self.texts[start:end].tobytes().decode('utf-8')
+
+    def doc_id(self, position):
+        start, end = self.id_offsets[position], self.id_offsets[position + 1]
+        return self.ids[start:end].tobytes().decode('utf-8')
+
+    def metadata(self, position):
+        return {
+            field: self.field_values[j][code]
+            for j, (field, code) in enumerate(zip(self.fields, self.metadata_codes[position].tolist()))
+            if code >= 0
+        }
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.size
+        if not 0 <= position < self.size:
+            raise IndexError("document position out of range")
+        return {"id": self.doc_id(position), "content": self.content(position), "metadata": self.metadata(position)}
+
+    def __iter__(self):
+        return (self[position] for position in range(self.size))
+
+    def position(self, doc_id):
+        """Position of the first document with this id (binary search over the sorted ids), or None"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.doc_id(int(self.id_order[mid])) < doc_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.size and self.doc_id(int(self.id_order[lo])) == doc_id:
+            return int(self.id_order[lo])
+        return None
+
+    def get(self, doc_id, default=None):
+        """Fetch a document by id"""
+        position = self.position(doc_id)
+        return default if position is None else self[position]
+
+    def metadata_columns(self):
+        """{field: (codes, values)} as produced by encode_metadata, without decoding any document"""
+        return {field: (self.metadata_codes[:, j], self.field_values[j]) for j, field in enumerate(self.fields)}
@@ -0,0 +1,106 @@
+import os
+import json
+import shutil
+
+SHARD_DIR = 'knowledge_base/shards'
+SHARD_MANIFEST = 'shards.json'
+# Documents per JSONL shard
+DOCUMENTS_PER_SHARD = 10000
+
+
+class ShardWriter:
+    """Writes documents and knowledge base entries as numbered JSONL shards.
+
+    Nothing is kept in memory beyond the open shard. Like DocumentStore.write,
+    shards are written into a sibling directory that replaces the old one on
+    close(), together with a manifest of how many documents each shard holds.
+    """
+
+    def __init__(self, path=SHARD_DIR, documents_per_shard=DOCUMENTS_PER_SHARD):
+        self.path = path
+        self.tmp_path = path.rstrip('/\\') + '.tmp'
+        self.documents_per_shard = documents_per_shard
+        self.shards = []
+        self.num_restaurants = 0
+        self._documents = None
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self._restaurants = open(os.path.join(self.tmp_path, 'restaurants.jsonl'), 'w', encoding='utf-8')
+
+    def _next_shard(self):
+        if self._documents is not None:
+            self._documents.close()
+        name = f'documents-{len(self.shards):05d}.jsonl'
+        self.shards.append({"file": name, "num_documents": 0})
+        self._documents = open(os.path.join(self.tmp_path, name), 'w', encoding='utf-8')
+
+    def add_document(self, document):
+        if self._documents is None or self.shards[-1]["num_documents"] == self.documents_per_shard:
+            self._next_shard()
+        self._documents.write(json.dumps(document, ensure_ascii=False) + '\n')
+        self.shards[-1]["num_documents"] += 1
+
+    def add_restaurant(self, restaurant):
+        self._restaurants.write(json.dumps(restaurant, ensure_ascii=False) + '\n')
+        self.num_restaurants += 1
+
+    def close(self):
+        if self._documents is not None:
+            self._documents.close()
+        self._restaurants.close()
+        with open(os.path.join(self.tmp_path, SHARD_MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump({"num_documents": sum(shard["num_documents"] for shard in self.shards),
+                       "num_restaurants": self.num_restaurants, "shards": self.shards}, f, indent=2)
+        old_path = self.path.rstrip('/\\') + '.old'
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.rename(self.path, old_path)
+        os.rename(self.tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._restaurants.close()
+            if self._documents is not None:
+                self._documents.close()
+        return False
+
+
+def _read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class DocumentShards:
+    """The documents of a shard directory as a re-iterable sequence.
+
+    len() comes from the manifest and every iteration streams the shards
+    from disk again, so it can be passed wherever a documents list is
+    iterated (embedding, BM25, the document store) without loading them all.
+    """
+
+    def __init__(self, path=SHARD_DIR):
+        self.path = path
+        with open(os.path.join(path, SHARD_MANIFEST), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+    @staticmethod
+    def exists(path=SHARD_DIR):
+        return os.path.exists(os.path.join(path, SHARD_MANIFEST))
+
+    def __len__(self):
+        return self.manifest["num_documents"]
+
+    def __iter__(self):
+        for shard in self.manifest["shards"]:
+            yield from _read_jsonl(os.path.join(self.path, shard["file"]))
+
+    def restaurants(self):
+        return _read_jsonl(os.path.join(self.path, 'restaurants.jsonl'))
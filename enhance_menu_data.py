@@ -1,5 +1,31 @@
-import pandas as pd
+import re
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+NON_VEG_TERMS = ["chicken", "mutton", "fish", "pork", "prawn", "egg", "lamb", "beef", "shrimp"]
+VEG_TERMS = ["paneer", "tofu", "veg", "vegetable", "mushroom", "dal", "cheese"]
+
+# Checked in order; the first key found in the category wins
+CATEGORY_MAPPING = {
+    "starters": "Appetizers",
+    "appetizers": "Appetizers",
+    "main course": "Main Courses",
+    "mains": "Main Courses",
+    "pasta": "Pasta & Pizza",
+    "pizza": "Pasta & Pizza",
+    "desserts": "Desserts",
+    "drinks (beverages)": "Beverages",
+    "beverages": "Beverages",
+    "breads": "Breads",
+    "rice & noodles": "Rice & Noodles",
+    "snacks": "Snacks",
+    "salads": "Salads",
+}
+
+NON_VEG_RE = re.compile("|".join(map(re.escape, NON_VEG_TERMS)))
+VEG_RE = re.compile("|".join(map(re.escape, VEG_TERMS)))
 
 # --- Enhancement Functions ---
 
@@ -12,12 +38,9 @@ def infer_dietary_info(item_name, tags=""):
     elif "vegetarian" in tags_lower:
         return "Vegetarian"
         
-    non_veg_terms = ["chicken", "mutton", "fish", "pork", "prawn", "egg", "lamb", "beef", "shrimp"]
-    veg_terms = ["paneer", "tofu", "veg", "vegetable", "mushroom", "dal", "cheese"]
-    
-    if any(term in item_lower for term in non_veg_terms):
+    if any(term in item_lower for term in NON_VEG_TERMS):
         return "Non-Vegetarian"
-    if any(term in item_lower for term in veg_terms):
+    if any(term in item_lower for term in VEG_TERMS):
         return "Vegetarian"
     
     return "Unknown"
@@ -60,79 +83,145 @@ def normalize_category(category):
         
     category_str = str(category).strip().lower()
     
-    mapping = {
-        "starters": "Appetizers",
-        "appetizers": "Appetizers",
-        "main course": "Main Courses",
-        "mains": "Main Courses",
-        "pasta": "Pasta & Pizza",
-        "pizza": "Pasta & Pizza",
-        "desserts": "Desserts",
-        "drinks (beverages)": "Beverages",
-        "beverages": "Beverages",
-        "breads": "Breads",
-        "rice & noodles": "Rice & Noodles",
-        "snacks": "Snacks",
-        "salads": "Salads",
-    }
-    
-    for key in mapping:
+    for key in CATEGORY_MAPPING:
         if key in category_str:
-            return mapping[key]
+            return CATEGORY_MAPPING[key]
             
     return category_str.capitalize()
 
-# --- Enhance All Menus ---
+# --- Vectorized Enhancement ---
 
-menu_dir = "Menu"
-enhanced_dir = "Enhanced_Menu"
-os.makedirs(enhanced_dir, exist_ok=True)
+def _text_column(df, column):
+    """Column as strings with NaN (or a missing column) mapped to empty strings"""
+    if column not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    values = df[column]
+    return values.where(values.notna(), "").astype(str)
 
-print("Starting menu enhancement process...")
+def _first_match(conditions, choices, default):
+    """Vectorized if/elif chain: the first true condition picks its choice"""
+    result = default
+    for condition, choice in reversed(list(zip(conditions, choices))):
+        result = result.mask(condition, choice)
+    return result
 
-for menu_file in os.listdir(menu_dir):
-    if not menu_file.endswith(".csv"):
-        continue
+def infer_dietary_info_column(names, tags):
+    """Vectorized infer_dietary_info over name and tag columns"""
+    names = names.str.lower()
+    tags = tags.str.lower()
+    return _first_match(
+        [tags.str.contains("vegan", regex=False),
+         tags.str.contains("vegetarian", regex=False),
+         names.str.contains(NON_VEG_RE),
+         names.str.contains(VEG_RE)],
+        ["Vegan", "Vegetarian", "Non-Vegetarian", "Vegetarian"],
+        pd.Series("Unknown", index=names.index, dtype=object)
+    )
         
-    print(f"Processing {menu_file}...")
-    menu_path = os.path.join(menu_dir, menu_file)
+def generate_description_column(names, categories, prices):
+    """Vectorized generate_description over name, category and price columns"""
+    names_lower = names.str.lower()
+    categories_lower = categories.str.lower()
+    kind = _first_match(
+        [names_lower.str.contains("chicken", regex=False),
+         names_lower.str.contains("paneer", regex=False),
+         categories_lower.str.contains("pasta", regex=False),
+         categories_lower.str.contains("dessert", regex=False)],
+        [" delicious chicken dish", " classic Indian vegetarian dish", " pasta preparation", " sweet dessert"],
+        " " + categories_lower + " item"
+    )
+    priced = (" priced at " + prices).where((prices != "") & (prices != "nan"), "")
+    descriptions = names + " is a" + kind + priced + "."
+    return descriptions.where(names != "", "")
+    
+def normalize_category_column(categories):
+    """Vectorized normalize_category; categories repeat a lot, so only unique values are normalized"""
+    uniques = pd.Series(categories.dropna().unique(), dtype=object)
+    cleaned = uniques.astype(str).str.strip().str.lower()
+    normalized = _first_match(
+        [cleaned.str.contains(key, regex=False) for key in CATEGORY_MAPPING],
+        list(CATEGORY_MAPPING.values()),
+        cleaned.str.capitalize()
+    )
+    lookup = dict(zip(uniques, normalized))
+    return categories.map(lookup).where(categories.notna(), "Uncategorized")
+
+def enhance_menu(menu_df):
+    """Add Dietary_Info, fill missing descriptions and add Standard_Category"""
+    menu_df = menu_df.copy()
+    
+    # Add Tags column if not exists
+    if 'Tags' not in menu_df.columns:
+        menu_df['Tags'] = ""
+    
+    names = _text_column(menu_df, "Name")
+    
+    # Add dietary information
+    menu_df["Dietary_Info"] = infer_dietary_info_column(names, _text_column(menu_df, "Tags"))
+    
+    # Generate descriptions where missing
+    generated = generate_description_column(names, _text_column(menu_df, "Category"), _text_column(menu_df, "Price"))
+    if "Description" in menu_df.columns:
+        existing = menu_df["Description"]
+        has_description = existing.notna() & existing.astype(str).str.strip().ne("")
+        menu_df["Description"] = existing.astype(object).where(has_description, generated)
+    else:
+        menu_df["Description"] = generated
+    
+    # Normalize categories
+    if 'Category' in menu_df.columns:
+        menu_df["Standard_Category"] = normalize_category_column(menu_df["Category"])
+    else:
+        menu_df["Standard_Category"] = "Uncategorized"
     
+    return menu_df
+
+def enhance_menu_file(menu_path, output_path):
+    """Enhance one menu CSV; returns a status message"""
+    menu_file = os.path.basename(menu_path)
     try:
         menu_df = pd.read_csv(menu_path)
         
         # Check if dataframe has required columns
         if 'Name' not in menu_df.columns:
-            print(f"Warning: {menu_file} missing 'Name' column, skipping...")
-            continue
-            
-        # Add Tags column if not exists
-        if 'Tags' not in menu_df.columns:
-            menu_df['Tags'] = ""
-            
-        # Add dietary information
-        menu_df["Dietary_Info"] = menu_df.apply(
-            lambda row: infer_dietary_info(row.get("Name"), row.get("Tags", "")), 
-            axis=1
-        )
-        
-        # Generate descriptions where missing
-        menu_df["Description"] = menu_df.apply(
-            lambda row: row.get("Description") if pd.notna(row.get("Description")) and str(row.get("Description")).strip()
-            else generate_description(row.get("Name"), row.get("Category"), price=row.get("Price")), 
-            axis=1
-        )
+            return f"Warning: {menu_file} missing 'Name' column, skipping..."
         
-        # Normalize categories
-        if 'Category' in menu_df.columns:
-            menu_df["Standard_Category"] = menu_df["Category"].apply(normalize_category)
-        else:
-            menu_df["Standard_Category"] = "Uncategorized"
-            
         # Save enhanced menu
-        menu_df.to_csv(os.path.join(enhanced_dir, menu_file), index=False)
-        print(f"Successfully enhanced {menu_file}")
-        
+        enhance_menu(menu_df).to_csv(output_path, index=False)
+        return f"Successfully enhanced {menu_file}"
     except Exception as e:
-        print(f"Error processing {menu_file}: {e}")
+        return f"Error processing {menu_file}: {e}"
+        
+# --- Enhance All Menus ---
+
+def enhance_all_menus(menu_dir="Menu", enhanced_dir="Enhanced_Menu", workers=None):
+    """Enhance every menu CSV in menu_dir in parallel worker processes"""
+    os.makedirs(enhanced_dir, exist_ok=True)
+    
+    print("Starting menu enhancement process...")
+    
+    menu_files = sorted(f for f in os.listdir(menu_dir) if f.endswith(".csv"))
+    inputs = [os.path.join(menu_dir, f) for f in menu_files]
+    outputs = [os.path.join(enhanced_dir, f) for f in menu_files]
+    
+    if workers == 1 or len(menu_files) <= 1:
+        messages = map(enhance_menu_file, inputs, outputs)
+        for message in messages:
+            print(message)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for message in executor.map(enhance_menu_file, inputs, outputs):
+                print(message)
+    
+    print("All menu files processed.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Add dietary info, descriptions and standard categories to scraped menus")
+    parser.add_argument('--menu-dir', default="Menu")
+    parser.add_argument('--enhanced-dir', default="Enhanced_Menu")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+    enhance_all_menus(args.menu_dir, args.enhanced_dir, args.workers)
 
-print("All menu files processed.")
+if __name__ == "__main__":
+    main()
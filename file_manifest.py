@@ -0,0 +1,184 @@
+import os
+import re
+import json
+import argparse
+import threading
+import unicodedata
+from urllib.parse import urlsplit
+
+MANIFEST_PATH = 'file_manifest.jsonl'
+MENU_DIR = 'Menu'
+ENHANCED_MENU_DIR = 'Enhanced_Menu'
+REVIEWS_DIR = 'Reviews'
+
+_lock = threading.Lock()
+# Fields recorded by this process, so a caller can see which file a scraper just saved
+_recorded = {}
+
+
+def restaurant_key(name):
+    """Normalized restaurant name: accents stripped, lowercase, runs of other characters as '-'"""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def url_slug(url):
+    """Last path segment of a Zomato restaurant URL ('/order' and '/reviews' suffixes dropped)"""
+    parts = [part for part in urlsplit(str(url)).path.split('/') if part]
+    while parts and parts[-1] in ('order', 'reviews', 'menu', 'info'):
+        parts.pop()
+    return parts[-1] if parts else ''
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Fold the manifest's JSON lines (later lines win) into {"restaurants": {slug: entry}}"""
+    if not os.path.exists(path):
+        return None
+    restaurants = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                fields = json.loads(line)
+                restaurants.setdefault(fields.pop("slug"), {}).update(fields)
+    return {"restaurants": restaurants}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Write a compacted manifest, one line per restaurant"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for slug, entry in sorted(manifest["restaurants"].items()):
+            f.write(json.dumps({"slug": slug, **entry}, ensure_ascii=False, sort_keys=True) + '\n')
+    os.replace(tmp_path, path)
+
+
+def record(url, path=MANIFEST_PATH, **fields):
+    """Record fields (name, menu, reviews) for a restaurant URL in the manifest.
+
+    Called by the scrapers whenever they save a file. Each call appends one
+    line, so recording stays O(1) however large the manifest grows, and is
+    safe from concurrent scraping threads; compact() folds the lines back
+    into one per restaurant when a scrape finishes.
+    """
+    slug = url_slug(url)
+    fields = {key: value for key, value in fields.items() if value is not None}
+    if not slug or not fields:
+        return
+    with _lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"slug": slug, **fields}, ensure_ascii=False, sort_keys=True) + '\n')
+        _recorded.setdefault(slug, {}).update(fields)
+
+
+def compact(path=MANIFEST_PATH):
+    """Rewrite the manifest with one line per restaurant, so repeated scrapes do not grow it"""
+    with _lock:
+        if os.path.exists(path):
+            save_manifest(load_manifest(path), path)
+
+
+def recorded(url):
+    """Fields this process has recorded for a restaurant URL (without reading the manifest)"""
+    with _lock:
+        return dict(_recorded.get(url_slug(url), {}))
+
+
+def _csv_files(directory):
+    if not os.path.exists(directory):
+        return []
+    return sorted(f for f in os.listdir(directory) if f.endswith('.csv'))
+
+
+def _match_by_name(filenames, names, strip_underscores=False):
+    """Map restaurant name -> filename for files saved before the manifest existed.
+
+    A file matches when the part of its name before the first ', ' normalizes
+    to the restaurant's key, which is a dict lookup per file. Files left over
+    fall back to the old substring test, picking the longest matching name.
+    """
+    by_key = {restaurant_key(name): name for name in names}
+    matches = {}
+    leftovers = []
+    for filename in filenames:
+        stem = filename[:-len('.csv')]
+        if strip_underscores:
+            stem = stem.replace('_', ' ')
+        name = by_key.get(restaurant_key(stem.split(', ')[0])) or by_key.get(restaurant_key(stem))
+        if name is not None and name not in matches:
+            matches[name] = filename
+        else:
+            leftovers.append(filename)
+    for filename in leftovers:
+        candidates = [name for name in names if name not in matches and
+                      (name.replace(' ', '_') if strip_underscores else name) in filename]
+        if candidates:
+            matches[max(candidates, key=len)] = filename
+    return matches
+
+
+def manifest_from_files(restaurants_df):
+    """Build a manifest for files saved before the scrapers recorded one"""
+    names = restaurants_df['Name'].tolist()
+    urls = restaurants_df['URL'].tolist() if 'URL' in restaurants_df.columns else [None] * len(names)
+
+    menus = _match_by_name(sorted(set(_csv_files(MENU_DIR)) | set(_csv_files(ENHANCED_MENU_DIR))), names)
+    reviews = _match_by_name(_csv_files(REVIEWS_DIR), names, strip_underscores=True)
+
+    manifest = {"restaurants": {}}
+    for name, url in zip(names, urls):
+        slug = url_slug(url) if isinstance(url, str) else restaurant_key(name)
+        entry = {"name": name, "menu": menus.get(name), "reviews": reviews.get(name)}
+        manifest["restaurants"][slug] = {key: value for key, value in entry.items() if value is not None}
+    return manifest
+
+
+def resolve_files(restaurants_df, manifest, menu_dir=ENHANCED_MENU_DIR, reviews_dir=REVIEWS_DIR):
+    """Look up each restaurant's menu and review file in the manifest.
+
+    Restaurants are found by URL slug, falling back to the normalized name.
+    Returns name -> path dicts for menus and reviews, the restaurants with no
+    file on disk, and the files on disk no restaurant claims.
+    """
+    entries = manifest.get("restaurants", {})
+    by_name = {restaurant_key(entry["name"]): entry for entry in entries.values() if entry.get("name")}
+    urls = restaurants_df['URL'].tolist() if 'URL' in restaurants_df.columns else [None] * len(restaurants_df)
+
+    menu_files = set(_csv_files(menu_dir))
+    review_files = set(_csv_files(reviews_dir))
+    menus, reviews = {}, {}
+    missing = {"menus": [], "reviews": []}
+    for name, url in zip(restaurants_df['Name'].tolist(), urls):
+        entry = entries.get(url_slug(url)) if isinstance(url, str) else None
+        entry = entry or by_name.get(restaurant_key(name), {})
+        if entry.get("menu") in menu_files:
+            menus[name] = os.path.join(menu_dir, entry["menu"])
+        else:
+            missing["menus"].append(name)
+        if entry.get("reviews") in review_files:
+            reviews[name] = os.path.join(reviews_dir, entry["reviews"])
+        else:
+            missing["reviews"].append(name)
+
+    claimed = set(menus.values()) | set(reviews.values())
+    orphans = [os.path.join(directory, f) for directory, files in ((menu_dir, menu_files), (reviews_dir, review_files))
+               for f in sorted(files) if os.path.join(directory, f) not in claimed]
+    return menus, reviews, missing, orphans
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or check the restaurant -> data file manifest")
+    parser.add_argument('--rebuild', action='store_true', help="Recreate the manifest from files already on disk")
+    parser.add_argument('--compact', action='store_true', help="Fold appended records into one line per restaurant")
+    args = parser.parse_args()
+
+    if args.compact:
+        compact()
+
+    if args.rebuild:
+        import pandas as pd
+        manifest = manifest_from_files(pd.read_csv('Restaurants.csv'))
+        save_manifest(manifest)
+        print(f"Wrote {MANIFEST_PATH} with {len(manifest['restaurants'])} restaurants")
+    from data_utils import get_restaurant_files
+    files = get_restaurant_files()
+    print(f"{len(files['menus'])} menus and {len(files['reviews'])} review files resolved")
@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+
+HTTP_CACHE_DIR = '.http_cache'
+
+
+class HTTPCache:
+    """On-disk response cache keyed by URL for conditional re-scrapes.
+
+    Each entry keeps the body, its hash and the ETag/Last-Modified validators,
+    plus optional parsed results tagged with the body hash they came from.
+    Entries are evicted least-recently-used once the total body size passes
+    `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {"not_modified": 0, "unchanged": 0, "changed": 0, "parse_skipped": 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._entries = {}
+        for filename in os.listdir(cache_dir):
+            if filename.endswith('.json'):
+                try:
+                    with open(os.path.join(cache_dir, filename), 'r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                    self._entries[entry["key"]] = entry
+                except (OSError, ValueError, KeyError):
+                    continue
+        self._size = sum(entry["size"] for entry in self._entries.values())
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + suffix)
+
+    def _write_entry(self, entry):
+        with open(self._path(entry["key"], '.json'), 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+
+    def conditional_headers(self, url):
+        """Validators to send with a request for `url`"""
+        entry = self._entries.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers['If-None-Match'] = entry["etag"]
+            if entry.get("last_modified"):
+                headers['If-Modified-Since'] = entry["last_modified"]
+        return headers
+
+    def resolve(self, url, response):
+        """Return a response with the full body and `unchanged` set when the page did not change"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if response.status_code == 304 and entry is not None:
+                response = self._cached_response(entry, response)
+                response.unchanged = True
+                self.stats["not_modified"] += 1
+                self._touch(entry)
+            elif response.status_code == 200:
+                body_hash = hashlib.sha1(response.content).hexdigest()
+                response.unchanged = entry is not None and entry["body_hash"] == body_hash
+                if response.unchanged:
+                    self.stats["unchanged"] += 1
+                    self._touch(entry)
+                else:
+                    self.stats["changed"] += 1
+                    self._store(url, response, body_hash, entry)
+            else:
+                response.unchanged = False
+        response.cache_key = url
+        return response
+
+    def _cached_response(self, entry, not_modified):
+        with open(self._path(entry["key"], '.body'), 'rb') as f:
+            body = f.read()
+        response = requests.Response()
+        response._content = body
+        response.status_code = 200
+        response.headers = not_modified.headers
+        response.url = not_modified.url
+        response.encoding = entry.get("encoding")
+        return response
+
+    def _touch(self, entry):
+        entry["accessed"] = time.time()
+        self._write_entry(entry)
+
+    def _store(self, url, response, body_hash, previous):
+        with open(self._path(url, '.body'), 'wb') as f:
+            f.write(response.content)
+        entry = {
+            "key": url,
+            "etag": response.headers.get('ETag'),
+            "last_modified": response.headers.get('Last-Modified'),
+            "encoding": response.encoding,
+            "body_hash": body_hash,
+            "size": len(response.content),
+            "accessed": time.time(),
+            "parsed": {}
+        }
+        self._size += entry["size"] - (previous["size"] if previous else 0)
+        self._entries[url] = entry
+        self._write_entry(entry)
+        self._evict()
+
+    def _evict(self):
+        for entry in sorted(self._entries.values(), key=lambda e: e["accessed"]):
+            if self._size <= self.max_bytes:
+                break
+            for suffix in ('.json', '.body'):
+                try:
+                    os.remove(self._path(entry["key"], suffix))
+                except OSError:
+                    pass
+            self._size -= entry["size"]
+            del self._entries[entry["key"]]
+
+    def parse(self, response, kind, parse_fn):
+        """Return parse_fn(response), reusing the stored result when the body is unchanged.
+
+        Parsed results must be JSON-serializable.
+        """
+        url = getattr(response, 'cache_key', None)
+        entry = self._entries.get(url)
+        if entry is not None and getattr(response, 'unchanged', False):
+            stored = entry["parsed"].get(kind)
+            if stored is not None and stored["body_hash"] == entry["body_hash"]:
+                self.stats["parse_skipped"] += 1
+                return stored["value"]
+
+        value = parse_fn(response)
+        if entry is not None:
+            with self._lock:
+                # Skip entries evicted (or replaced) meanwhile: writing one back would leave a .json
+                # without its .body
+                if self._entries.get(url) is entry:
+                    entry["parsed"][kind] = {"body_hash": entry["body_hash"], "value": value}
+                    self._write_entry(entry)
+        return value
@@ -0,0 +1,126 @@
+import os
+import shutil
+import importlib.util
+import numpy as np
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+GENERATOR_MODEL = 'google/flan-t5-base'
+# torch: fp32 PyTorch; int8: PyTorch with dynamically quantized Linear layers;
+# onnx / onnx-int8: ONNX Runtime sessions over exported (and quantized) models
+INFERENCE_BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+# Used when no backend is passed, so the Streamlit app can be switched without code changes
+BACKEND_ENV = 'RAG_INFERENCE_BACKEND'
+# Packages the onnx backends import; requirements-onnx.txt installs them
+ONNX_REQUIREMENTS = ('optimum', 'onnxruntime')
+# Exported ONNX models are kept here and reused by every later process
+ONNX_CACHE_DIR = 'models/onnx'
+# all-MiniLM-L6-v2 truncates its inputs to this many tokens
+EMBEDDING_MAX_LENGTH = 256
+
+
+def resolve_backend(backend=None):
+    backend = backend or os.environ.get(BACKEND_ENV) or 'torch'
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"inference backend must be one of {INFERENCE_BACKENDS}, got {backend!r}")
+    if backend.startswith('onnx'):
+        missing = [name for name in ONNX_REQUIREMENTS if importlib.util.find_spec(name) is None]
+        if missing:
+            raise ImportError(f"the {backend} backend needs {', '.join(missing)}; "
+                              f"install them with `pip install -r requirements-onnx.txt`")
+    return backend
+
+
+def _quantize_linear(model):
+    """int8 weights for every Linear layer; activations are quantized on the fly"""
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _hub_id(model_name):
+    # sentence-transformers resolves bare names inside its own organisation
+    return model_name if '/' in model_name else f'sentence-transformers/{model_name}'
+
+
+def onnx_model_dir(model_name, ort_class, quantize=False):
+    """Directory of the exported model, exporting (and quantizing) it on first use"""
+    name = _hub_id(model_name).replace('/', '--')
+    export_dir = os.path.join(ONNX_CACHE_DIR, name)
+    if not os.path.exists(os.path.join(export_dir, 'config.json')):
+        print(f"Exporting {model_name} to ONNX in {export_dir}...")
+        model = ort_class.from_pretrained(_hub_id(model_name), export=True)
+        model.save_pretrained(export_dir + '.tmp')
+        from transformers import AutoTokenizer
+        AutoTokenizer.from_pretrained(_hub_id(model_name)).save_pretrained(export_dir + '.tmp')
+        shutil.rmtree(export_dir, ignore_errors=True)
+        os.rename(export_dir + '.tmp', export_dir)
+    if not quantize:
+        return export_dir
+
+    quantized_dir = export_dir + '-int8'
+    if not os.path.exists(os.path.join(quantized_dir, 'config.json')):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print(f"Quantizing {export_dir} to int8...")
+        shutil.rmtree(quantized_dir + '.tmp', ignore_errors=True)
+        shutil.copytree(export_dir, quantized_dir + '.tmp')
+        for file_name in os.listdir(export_dir):
+            if file_name.endswith('.onnx'):
+                quantize_dynamic(os.path.join(export_dir, file_name), os.path.join(quantized_dir + '.tmp', file_name),
+                                 weight_type=QuantType.QInt8)
+        shutil.rmtree(quantized_dir, ignore_errors=True)
+        os.rename(quantized_dir + '.tmp', quantized_dir)
+    return quantized_dir
+
+
+class OnnxSentenceEmbedder:
+    """ONNX Runtime replacement for SentenceTransformer('all-MiniLM-L6-v2').encode.
+
+    Mirrors the model's pipeline: transformer, mean pooling over the attention
+    mask, then L2 normalization.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, quantize=False):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        model_dir = onnx_model_dir(model_name, ORTModelForFeatureExtraction, quantize)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir)
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=EMBEDDING_MAX_LENGTH, return_tensors='np')
+            hidden = self.model(**inputs).last_hidden_state
+            hidden = hidden.numpy() if hasattr(hidden, 'numpy') else np.asarray(hidden)
+            mask = inputs['attention_mask'][..., None].astype('float32')
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        embeddings = np.vstack(batches).astype('float32') if batches else np.zeros((0, 384), dtype='float32')
+        return embeddings[0] if single else embeddings
+
+
+def load_embedder(backend='torch', model_name=EMBEDDING_MODEL):
+    if backend in ('onnx', 'onnx-int8'):
+        return OnnxSentenceEmbedder(model_name, quantize=backend == 'onnx-int8')
+    from sentence_transformers import SentenceTransformer
+    if backend == 'int8':
+        return _quantize_linear(SentenceTransformer(model_name, device='cpu'))
+    return SentenceTransformer(model_name)
+
+
+def load_generator(backend='torch', model_name=GENERATOR_MODEL):
+    """text2text-generation pipeline for the backend"""
+    from transformers import pipeline
+    if backend in ('onnx', 'onnx-int8'):
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        from transformers import AutoTokenizer
+        model_dir = onnx_model_dir(model_name, ORTModelForSeq2SeqLM, quantize=backend == 'onnx-int8')
+        return pipeline("text2text-generation", model=ORTModelForSeq2SeqLM.from_pretrained(model_dir),
+                        tokenizer=AutoTokenizer.from_pretrained(model_dir))
+    if backend == 'int8':
+        generator = pipeline("text2text-generation", model=model_name, device=-1)
+        generator.model = _quantize_linear(generator.model)
+        return generator
+    return pipeline("text2text-generation", model=model_name, device_map="auto")
@@ -1,7 +1,14 @@
-import json
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup
+import file_manifest
+from scrape_engine import parse_response
+from page_extract import extract_ld_json, select_ld_json, RESTAURANT_TYPES
+
+INFO_COLUMNS = ['Type', 'Name', 'URL', 'Opening_Hours',
+                'Street', 'Locality', 'Region', 'PostalCode', 'Country',
+                'Latitude', 'Longitude', 'Phone',
+                'Price_Range', 'Payment_Methods',
+                'Image_URL', 'Cuisine', 'Rating', 'Rating_Count']
 
 headers = {'User-Agent': 'Mozilla/5.0 (Macintosh;'
                          ' Intel Mac OS X 10_15_4)'
@@ -9,24 +16,31 @@ headers = {'User-Agent': 'Mozilla/5.0 (Macintosh;'
                          ' Chrome/83.0.4103.97 Safari/537.36'}
 
 
-def get_info(url):
+def get_info(url, client=None):
     """ Get Information about the restaurant from URL """
     
     global headers
     try:
-        webpage = requests.get(url, headers=headers, timeout=3)
-        html_text = BeautifulSoup(webpage.text, 'lxml')
-        
-        # Check if there are enough script tags
-        script_tags = html_text.find_all('script', type='application/ld+json')
-        if len(script_tags) <= 1:
-            print(f"Warning: Not enough script tags found for {url}. Found only {len(script_tags)}.")
+        webpage = (client or requests).get(url, headers=headers, timeout=3)
+    except Exception as e:
+        print(f"Error scraping {url}: {e}")
+        return (None,) * 18
+    return tuple(parse_response(client, webpage, 'info', parse_info))
+
+
+def parse_info(webpage):
+    """ Parse the restaurant information out of a fetched page """
+    
+    url = webpage.url
+    try:
+        # Pick the restaurant ld+json block by its @type rather than by its position
+        blocks = extract_ld_json(webpage.text)
+        info = select_ld_json(blocks, types=RESTAURANT_TYPES, key='name')
+        if info is None:
+            print(f"Warning: No restaurant ld+json block found for {url}. Found {len(blocks)} blocks.")
             # Return a tuple of None values with the correct length
             return (None,) * 18  # Assuming 18 fields based on the original function
         
-        info = script_tags[1]
-        info = json.loads(info.string)
-        
         # Get values with default for potentially missing keys
         restaurant_type = info.get('@type', None)
         name = info.get('name', None)
@@ -78,25 +92,26 @@ def save_df(file_name, df):
     df.to_csv(file_name, index=False)
     
 
-def get_restaurant_info(url_list, save=True, file_name="Restaurants.csv"):
+def get_restaurant_info(url_list, save=True, file_name="Restaurants.csv", client=None):
     """ Get Restaurant Information from all urls passed """
 
     # Collecting the data
-    data = []
-    for url in url_list:
-        data.append(get_info(url))
+    if client is not None:
+        data = list(client.executor.map(lambda url: get_info(url, client), url_list))
+    else:
+        data = []
+        for url in url_list:
+            data.append(get_info(url))
         
     # Creating the DataFrame
-    columns = ['Type', 'Name', 'URL', 'Opening_Hours',
-               'Street', 'Locality', 'Region', 'PostalCode', 'Country',
-               'Latitude', 'Longitude', 'Phone',
-               'Price_Range', 'Payment_Methods',
-               'Image_URL', 'Cuisine', 'Rating', 'Rating_Count']
-    info_df = pd.DataFrame(data, columns=columns)
+    info_df = pd.DataFrame(data, columns=INFO_COLUMNS)
     
     # Save the df
     if save:
         save_df(file_name, info_df)
+        for url, name in zip(url_list, info_df['Name']):
+            if isinstance(name, str) and name:
+                file_manifest.record(url, name=name)
         
     return info_df
 
@@ -105,4 +120,5 @@ if __name__ == "__main__":
     urls = ["https://www.zomato.com/bangalore/voosh-thalis-bowls-1-bellandur-bangalore",
             "https://www.zomato.com/bangalore/flying-kombucha-itpl-main-road-whitefield-bangalore",
             "https://www.zomato.com/bangalore/matteo-coffea-indiranagar"]
-    get_restaurant_info(urls)
\ No newline at end of file
+    get_restaurant_info(urls)
+    file_manifest.compact()
\ No newline at end of file
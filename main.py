@@ -1,25 +1,46 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import file_manifest
 from info_scraper import get_restaurant_info
 from review_scraper import get_reviews
 from menu_scraper import get_menu
+from scrape_engine import ScrapeClient
+from http_cache import HTTPCache, HTTP_CACHE_DIR
 
+RESTAURANT_URLS = ["https://www.zomato.com/ncr/cabo-deli-1-sainik-farms-new-delhi",
+                   "https://www.zomato.com/bangalore/matteo-coffea-indiranagar",
+                   "https://www.zomato.com/bangalore/los-cavos-indiranagar-bangalore",
+                   "https://www.zomato.com/ncr/call-chotu-all-day-diner-1-kailash-colony-new-delhi",
+                   "https://www.zomato.com/bangalore/jamming-goat-3-0-indiranagar-bangalore",
+                   "https://www.zomato.com/bangalore/toit-indiranagar",
+                   "https://www.zomato.com/bangalore/kopitiam-lah-indiranagar-bangalore",
+                   "https://www.zomato.com/bangalore/native-bar-and-indian-kitchen-indiranagar-bangalore"]
 
-def scrape_all_data(url_list):
-    """Scrapes all data from the urls passed """
 
-    get_restaurant_info(url_list=url_list, file_name="Restaurants.csv")
-    for url in url_list:
-        get_reviews(url=url, max_reviews=50, sort="popular", save=True)
-        get_menu(url)
+def scrape_all_data(url_list, max_per_host=4, rate=2.0, max_workers=8, cache_dir=HTTP_CACHE_DIR, pages_dir=None):
+    """Scrapes all data from the urls passed; with pages_dir, fetched pages are saved for stub_server.py """
+
+    # Re-scrapes send conditional requests and skip parsing pages that have not changed
+    cache = HTTPCache(cache_dir) if cache_dir else None
+
+    # Info, reviews and menus for every restaurant are fetched concurrently through one pooled client;
+    # the client's own executor only runs leaf HTTP requests, so tasks here never wait on themselves
+    with ScrapeClient(max_per_host=max_per_host, rate=rate, cache=cache, pages_dir=pages_dir) as client, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(get_restaurant_info, url_list=url_list, file_name="Restaurants.csv", client=client)]
+        for url in url_list:
+            futures.append(executor.submit(get_reviews, url=url, max_reviews=50, sort="popular", save=True, client=client))
+            futures.append(executor.submit(get_menu, url, client=client))
+        try:
+            for future in futures:
+                future.result()
+        finally:
+            file_manifest.compact()
 
 
 if __name__ == '__main__':
-    urls = ["https://www.zomato.com/ncr/cabo-deli-1-sainik-farms-new-delhi",
-            "https://www.zomato.com/bangalore/matteo-coffea-indiranagar" ,
-            "https://www.zomato.com/bangalore/los-cavos-indiranagar-bangalore",
-            "https://www.zomato.com/ncr/call-chotu-all-day-diner-1-kailash-colony-new-delhi",
-            "https://www.zomato.com/bangalore/jamming-goat-3-0-indiranagar-bangalore",
-            "https://www.zomato.com/bangalore/toit-indiranagar",
-            "https://www.zomato.com/bangalore/kopitiam-lah-indiranagar-bangalore",
-            "https://www.zomato.com/bangalore/native-bar-and-indian-kitchen-indiranagar-bangalore",
-]
-    scrape_all_data(urls)
+    parser = argparse.ArgumentParser(description="Scrape info, menus and reviews for every restaurant")
+    parser.add_argument('--save-pages', metavar='DIR',
+                        help="Also save every fetched page here, for offline runs against stub_server.py")
+    args = parser.parse_args()
+    scrape_all_data(RESTAURANT_URLS, pages_dir=args.save_pages)
@@ -1,8 +1,9 @@
 import os
-import json
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup
+import file_manifest
+from scrape_engine import parse_response
+from page_extract import extract_ld_json, select_ld_json, extract_title, extract_menu_divs
 
 headers = {'User-Agent': 'Mozilla/5.0 (Macintosh;'
                          ' Intel Mac OS X 10_15_4)'
@@ -10,17 +11,16 @@ headers = {'User-Agent': 'Mozilla/5.0 (Macintosh;'
                          ' Chrome/83.0.4103.97 Safari/537.36'}
 
 
-def get_description(html_text):
+def get_description(page):
     """ Gets the Menu Item along with Description and Category """
     
-    scripts = html_text.find_all('script', type='application/ld+json')
-    if len(scripts) < 4:
-        print(f"Warning: Expected at least 4 script tags but found {len(scripts)}. Returning empty DataFrame.")
+    # The menu block is picked by its @type rather than by its position on the page
+    menu = select_ld_json(extract_ld_json(page), types=('Menu',), key='hasMenuSection')
+    if menu is None:
+        print("Warning: No menu ld+json block found. Returning empty DataFrame.")
         return pd.DataFrame(columns=['Name', 'Description', 'Category'])
     
-    menu = scripts[3]
     try:
-        menu = json.loads(menu.string)
         data = []
         for section in menu.get('hasMenuSection', []):
             name = section.get('name', '')
@@ -43,19 +43,18 @@ def get_description(html_text):
         # Creating the dataframe
         columns = ['Name', 'Description', 'Category']
         return pd.DataFrame(data, columns=columns)
-    except (json.JSONDecodeError, KeyError, TypeError) as e:
+    except (KeyError, TypeError, AttributeError) as e:
         print(f"Error parsing menu JSON: {e}")
         return pd.DataFrame(columns=['Name', 'Description', 'Category'])
 
 
 
-def get_price_tags(html_text):
+def get_price_tags(page):
     """ Gets the Menu Item along with Price and Tags """
     
-    menu_items = [div for div in html_text.find_all('div') if div.find('h4', recursive=False)]
+    menu_items = extract_menu_divs(page)
     data = []
     for item in menu_items:
-        item = item.find_all(text=True)
         name = item[0]
         price = item[-1].replace("₹", "Rs ")
         tags = ", ".join(item[1:-1])
@@ -77,36 +76,50 @@ def save_df(name, df):
     df.to_csv(f"Menu/{name}.csv", index=False)
 
 
-def get_menu(url, save=True):
+def parse_menu(webpage):
+    """ Parse the restaurant name and all Menu Items out of a fetched order page """
+    
+    page = webpage.text
+    title = extract_title(page)
+    restaurant_name = title[:-22] if title else "Unknown_Restaurant"
+    
+    # Collecting the data
+    df1 = get_description(page)
+    df2 = get_price_tags(page)
+    
+    # Only merge if both dataframes have data
+    if not df1.empty and not df2.empty:
+        menu_df = df1.merge(df2, on='Name', how='outer')
+    elif not df1.empty:
+        menu_df = df1
+    elif not df2.empty:
+        menu_df = df2
+    else:
+        menu_df = pd.DataFrame(columns=['Name', 'Description', 'Category', 'Price', 'Tags'])
+        print(f"No menu data found for {restaurant_name}")
+    
+    # Plain lists so the result can be kept in the HTTP cache
+    return {"restaurant_name": restaurant_name, "columns": list(menu_df.columns), "rows": menu_df.values.tolist()}
+
+
+def get_menu(url, save=True, client=None):
     """ Get all Menu Items from the passed url """
     
     global headers
+    restaurant_url = url
     url += '/order'
     
     try:
         # Request for the webpage
-        webpage = requests.get(url, headers=headers, timeout=5)
-        html_text = BeautifulSoup(webpage.text, 'lxml')
-        restaurant_name = html_text.head.find('title').text[:-22] if html_text.head and html_text.head.find('title') else "Unknown_Restaurant"
-        
-        # Collecting the data
-        df1 = get_description(html_text)
-        df2 = get_price_tags(html_text)
-        
-        # Only merge if both dataframes have data
-        if not df1.empty and not df2.empty:
-            menu_df = df1.merge(df2, on='Name', how='outer')
-        elif not df1.empty:
-            menu_df = df1
-        elif not df2.empty:
-            menu_df = df2
-        else:
-            menu_df = pd.DataFrame(columns=['Name', 'Description', 'Category', 'Price', 'Tags'])
-            print(f"No menu data found for {restaurant_name}")
+        webpage = (client or requests).get(url, headers=headers, timeout=5)
+        menu = parse_response(client, webpage, 'menu', parse_menu)
+        restaurant_name = menu["restaurant_name"]
+        menu_df = pd.DataFrame(menu["rows"], columns=menu["columns"])
         
         # Save the df
         if save and not menu_df.empty:
             save_df(restaurant_name, menu_df)
+            file_manifest.record(restaurant_url, menu=f"{restaurant_name}.csv")
         return menu_df
     except Exception as e:
         print(f"Error scraping menu from {url}: {e}")
@@ -116,4 +129,5 @@ def get_menu(url, save=True):
 
 if __name__ == "__main__":
     link = "https://www.zomato.com/bangalore/voosh-thalis-bowls-1-bellandur-bangalore"
-    dframe = get_menu(link, save=True)
\ No newline at end of file
+    dframe = get_menu(link, save=True)
+    file_manifest.compact()
\ No newline at end of file
@@ -0,0 +1,136 @@
+import re
+import json
+import numpy as np
+from doc_store import encode_metadata
+
+# Metadata fields that get an inverted bitmap per distinct value
+FILTER_FIELDS = ('type', 'restaurant', 'category', 'price_category', 'dietary_info')
+RANGE_FIELDS = ('min_price', 'max_price')
+
+PRICE_PATTERN = r'\s*(?:rs\.?|₹|inr)?\s*(\d+(?:\.\d+)?)'
+MAX_PRICE_RE = re.compile(r'\b(?:under|below|less than|cheaper than|within|up ?to)' + PRICE_PATTERN)
+MIN_PRICE_RE = re.compile(r'\b(?:over|above|more than|costlier than)' + PRICE_PATTERN)
+
+
+def filter_key(filters):
+    """Canonical, hashable form of a filter dict (None when unfiltered)"""
+    if not filters:
+        return None
+    return json.dumps(filters, sort_keys=True, default=str)
+
+
+class MetadataIndex:
+    """Dictionary-encoded metadata columns for pre-filtered retrieval.
+
+    Each filter field is an int32 array of codes into its distinct lowercased
+    values, so a filter is one vectorized comparison per field. Built from a
+    list of documents or straight from a DocumentStore's columns.
+
+    Filters are dicts such as
+    {"type": "menu_item", "dietary_info": "Vegetarian", "max_price": 500, "location": "Indiranagar"}.
+    List values match any of the listed values; fields are combined with AND.
+    """
+
+    def __init__(self, documents):
+        columns = documents.metadata_columns() if hasattr(documents, 'metadata_columns') else encode_metadata(documents)
+        self.size = len(documents)
+        self.codes = {}
+        self.vocab = {}
+        for field in FILTER_FIELDS:
+            self.codes[field], self.vocab[field] = self._lowercase_column(columns.get(field))
+
+        self.price_values = np.full(self.size, np.nan)
+        if 'price_value' in columns:
+            codes, values = columns['price_value']
+            numbers = np.array([np.nan if v is None else float(v) for v in values] + [np.nan])
+            self.price_values = numbers[np.asarray(codes)]  # code -1 picks the trailing NaN
+
+        self.restaurant_locations = {}
+        if 'type' in columns and 'location' in columns and 'restaurant' in columns:
+            type_codes, type_values = columns['type']
+            info = [code for code, value in enumerate(type_values) if value == "restaurant_info"]
+            location_codes, locations = columns['location']
+            restaurant_codes, restaurants = columns['restaurant']
+            for position in np.flatnonzero(np.isin(type_codes, info)):
+                location_code, restaurant_code = location_codes[position], restaurant_codes[position]
+                if location_code >= 0 and restaurant_code >= 0 and locations[location_code]:
+                    self.restaurant_locations[str(restaurants[restaurant_code]).lower()] = str(locations[location_code]).lower()
+
+    def _lowercase_column(self, column):
+        """Re-code a raw column by lowercased string value, dropping missing and NaN values"""
+        if column is None:
+            return np.full(self.size, -1, dtype='int32'), {}
+        codes, values = column
+        vocab = {}
+        remap = np.full(len(values) + 1, -1, dtype='int32')
+        for code, value in enumerate(values):
+            if value is None or value != value:  # skip missing and NaN values
+                continue
+            remap[code] = vocab.setdefault(str(value).lower(), len(vocab))
+        return remap[np.asarray(codes)], vocab
+
+    def _field_mask(self, field, values):
+        wanted = [
+            self.vocab[field][str(value).lower()]
+            for value in (values if isinstance(values, (list, tuple, set)) else [values])
+            if str(value).lower() in self.vocab[field]
+        ]
+        return np.isin(self.codes[field], wanted)
+
+    def mask(self, filters):
+        """Boolean mask over document positions matching every filter"""
+        mask = np.ones(self.size, dtype=bool)
+        for field, value in filters.items():
+            if field in FILTER_FIELDS:
+                mask &= self._field_mask(field, value)
+            elif field == 'max_price':
+                mask &= self.price_values <= float(value)  # NaN prices never match
+            elif field == 'min_price':
+                mask &= self.price_values >= float(value)
+            elif field == 'location':
+                # Locations live on restaurant_info docs; expand them to every doc of those restaurants
+                locations = [str(v).lower() for v in (value if isinstance(value, (list, tuple, set)) else [value])]
+                restaurants = [
+                    restaurant for restaurant, location in self.restaurant_locations.items()
+                    if any(loc in location for loc in locations)
+                ]
+                mask &= self._field_mask('restaurant', restaurants)
+            else:
+                raise ValueError(f"Unknown filter field '{field}'")
+        return mask
+
+    def parse_filters(self, question):
+        """Pull restaurant, locality, dietary and price filters out of simple question patterns"""
+        text = question.lower()
+        filters = {}
+
+        restaurants = [
+            name for name in self.vocab['restaurant']
+            if re.search(rf'\b{re.escape(name)}\b', text)
+        ]
+        if restaurants:
+            filters['restaurant'] = restaurants
+        else:
+            localities = {location.split(',')[0].strip() for location in self.restaurant_locations.values()}
+            mentioned = sorted(loc for loc in localities if loc and re.search(rf'\b{re.escape(loc)}\b', text))
+            if mentioned:
+                filters['location'] = mentioned
+
+        if re.search(r'\bnon[- ]?veg', text):
+            filters['dietary_info'] = 'Non-Vegetarian'
+        elif re.search(r'\bvegan\b', text):
+            filters['dietary_info'] = 'Vegan'
+        elif re.search(r'\bveg(?:etarian|gie)?\b', text):
+            filters['dietary_info'] = 'Vegetarian'
+
+        match = MAX_PRICE_RE.search(text)
+        if match:
+            filters['max_price'] = float(match.group(1))
+        match = MIN_PRICE_RE.search(text)
+        if match:
+            filters['min_price'] = float(match.group(1))
+
+        # Dietary info and prices only exist on individual menu item documents
+        if 'dietary_info' in filters or any(field in filters for field in RANGE_FIELDS):
+            filters['type'] = 'menu_item'
+        return filters
@@ -0,0 +1,210 @@
+import sys
+import time
+import bisect
+import threading
+from collections import Counter
+
+# Upper bounds of the histogram buckets, per metric; +Inf is implied
+HISTOGRAM_BUCKETS = {
+    'rag_stage_seconds': (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    # Squared L2 between normalized MiniLM vectors lies in [0, 4]
+    'rag_retrieved_distance': (0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0, 3.0, 4.0),
+    'rag_prompt_tokens': (64, 128, 192, 256, 320, 384, 448, 512, 1024),
+}
+METRIC_HELP = {
+    'rag_stage_seconds': "Time spent in each RestaurantRAG stage",
+    'rag_retrieved_distance': "L2 distance of dense retrieval results",
+    'rag_prompt_tokens': "Tokens in the prompts sent to the generator",
+    'rag_questions_total': "Questions answered",
+    'rag_retrievals_total': "Queries retrieved for",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe('rag_stage_seconds', time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullMetrics:
+    """Instrumentation turned off: every hook is a no-op"""
+    enabled = False
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def time(self, stage):
+        return _NULL_TIMER
+
+    def add_collector(self, collector):
+        pass
+
+
+class Metrics:
+    """Counters, histograms and stage timers for RestaurantRAG.
+
+    Observations are kept in memory and rendered in the Prometheus text
+    format, and/or forwarded to `callback(kind, name, value, labels)` as
+    they happen (e.g. to push them to statsd). Collectors registered with
+    add_collector are called at render time for values that already live
+    elsewhere, such as cache hit counts.
+    """
+    enabled = True
+
+    def __init__(self, callback=None, const_labels=None):
+        self.callback = callback
+        self.const_labels = dict(const_labels or {})
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self.callback is not None:
+            self.callback('counter', name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        bounds = HISTOGRAM_BUCKETS[name]
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": [0] * (len(bounds) + 1), "sum": 0.0, "count": 0}
+            histogram["buckets"][bisect.bisect_left(bounds, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+        if self.callback is not None:
+            self.callback('histogram', name, value, labels)
+
+    def time(self, stage):
+        """Context manager recording its duration under rag_stage_seconds{stage=...}"""
+        return _Timer(self, stage)
+
+    def add_collector(self, collector):
+        """collector() returns (name, 'counter' | 'gauge', value, labels) tuples read at render time"""
+        self.collectors.append(collector)
+
+    def _families(self):
+        """{name: (type, [(labels, value or histogram)])}"""
+        families = {}
+        with self._lock:
+            for (name, labels), value in self.counters.items():
+                families.setdefault(name, ('counter', []))[1].append((labels, value))
+            for (name, labels), histogram in self.histograms.items():
+                families.setdefault(name, ('histogram', []))[1].append(
+                    (labels, {**histogram, "buckets": list(histogram["buckets"])})
+                )
+        for collector in self.collectors:
+            for name, kind, value, labels in collector():
+                families.setdefault(name, (kind, []))[1].append((_label_key(labels), value))
+        return families
+
+    def render_prometheus(self):
+        const = _label_key(self.const_labels)
+        lines = []
+        for name, (kind, samples) in sorted(self._families().items()):
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                labels = const + labels
+                if kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(HISTOGRAM_BUCKETS[name] + ('+Inf',), value["buckets"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Plain-dict view of every metric, for JSON output"""
+        return {
+            name: {"type": kind, "samples": [{"labels": dict(labels), "value": value} for labels, value in samples]}
+            for name, (kind, samples) in self._families().items()
+        }
+
+
+class StackSampler:
+    """Sampling profiler: records a thread's call stack every `interval_ms` while running.
+
+    Stacks are counted in the collapsed "outer;...;inner count" format that
+    flame graph tools read. Nothing is sampled unless start() is called.
+    """
+
+    def __init__(self, interval_ms=5.0, thread_id=None):
+        self.interval = interval_ms / 1000
+        self.thread_id = thread_id
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_id is not None and thread_id != self.thread_id):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
@@ -0,0 +1,57 @@
+import re
+import json
+import html as html_lib
+import lxml.html
+
+# schema.org types Zomato uses for the restaurant ld+json block
+RESTAURANT_TYPES = ('Restaurant', 'FoodEstablishment', 'CafeOrCoffeeShop', 'BarOrPub', 'Bakery',
+                    'Brewery', 'FastFoodRestaurant', 'IceCreamShop', 'Winery', 'Distillery')
+
+LD_JSON_RE = re.compile(
+    r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title\s*>', re.IGNORECASE | re.DOTALL)
+HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+
+def extract_ld_json(page):
+    """Pull every ld+json block out of raw HTML without building a document tree"""
+    blocks = []
+    for match in LD_JSON_RE.finditer(page):
+        try:
+            blocks.append(json.loads(match.group(1)))
+        except ValueError:
+            continue
+    return blocks
+
+
+def _types(block):
+    block_type = block.get('@type', ()) if isinstance(block, dict) else ()
+    return set(block_type) if isinstance(block_type, list) else {block_type}
+
+
+def select_ld_json(blocks, types=(), key=None):
+    """First ld+json block with one of the given @types (and `key`, if given).
+
+    Falls back to the first block that merely has `key`, for pages whose
+    @type is missing or unusual.
+    """
+    candidates = [block for block in blocks if isinstance(block, dict) and (key is None or key in block)]
+    for block in candidates:
+        if _types(block) & set(types):
+            return block
+    return candidates[0] if key is not None and candidates else None
+
+
+def extract_title(page):
+    match = TITLE_RE.search(page)
+    return html_lib.unescape(match.group(1)) if match else None
+
+
+def extract_menu_divs(page):
+    """Text nodes of every div with a direct h4 child (one menu item each)"""
+    if not page.strip():
+        return []
+    tree = lxml.html.fromstring(page.encode('utf-8'), parser=HTML_PARSER)
+    return [[str(text) for text in div.xpath('.//text()')] for div in tree.xpath('//div[h4]')]
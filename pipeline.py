@@ -0,0 +1,427 @@
+import os
+import io
+import json
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import file_manifest
+from create_embeddings import INDEX_TYPES, replace_file, save_array, build_indexes
+
+PIPELINE_STATE_DIR = 'pipeline_state'
+CHECKPOINTS_PATH = os.path.join(PIPELINE_STATE_DIR, 'checkpoints.jsonl')
+# Key of the checkpoints for stages that run once over every restaurant
+ALL_UNITS = '*'
+# Restaurants whose documents go through the encoder together, and how long the first one waits for others
+EMBED_BATCH_RESTAURANTS = 32
+EMBED_MAX_WAIT_MS = 200.0
+MAX_REVIEWS = 50
+# Restaurants.csv columns the knowledge base reads as numbers
+NUMERIC_INFO_COLUMNS = ('Latitude', 'Longitude', 'Rating', 'Rating_Count')
+
+
+def file_hash(*paths):
+    """SHA-1 over the contents of the files (None for a missing one)"""
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(b'\0')
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def write_json(path, obj):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, indent=2, ensure_ascii=False)
+    replace_file(path, write)
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _state_path(kind, unit, extension='.json'):
+    return os.path.join(PIPELINE_STATE_DIR, kind, unit + extension)
+
+
+class CheckpointStore:
+    """Finished (unit, stage) records with the fingerprint of the inputs they were built from.
+
+    Like file_manifest.jsonl, records are appended one line each and folded
+    on load (later lines win). A record is only written after its outputs
+    are in place, so after a crash every recorded stage can be trusted.
+    """
+
+    def __init__(self, path=CHECKPOINTS_PATH):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # A crash can leave a torn last line
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[(entry["unit"], entry["stage"])] = entry
+
+    def get(self, unit, stage):
+        return self.entries.get((unit, stage))
+
+    def record(self, unit, stage, fingerprint, output):
+        entry = {"unit": unit, "stage": stage, "fingerprint": fingerprint, "output": output}
+        with self._lock:
+            self.entries[(unit, stage)] = entry
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compact(self):
+        """Rewrite the file with one line per (unit, stage)"""
+        with self._lock:
+            def write(tmp_path):
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for entry in self.entries.values():
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            replace_file(self.path, write)
+
+
+class Stage:
+    """One step of the per-restaurant graph.
+
+    `run(unit, inputs)` gets the outputs of the `deps` stages and returns a
+    JSON-able output (typically file paths); it is submitted to `executor`.
+    `fingerprint(unit, inputs)` identifies the inputs: a checkpoint with the
+    same fingerprint whose `outputs_exist` is skipped.
+    """
+
+    def __init__(self, name, run, fingerprint, executor, deps=(), outputs_exist=None):
+        self.name = name
+        self.run = run
+        self.fingerprint = fingerprint
+        self.executor = executor
+        self.deps = tuple(deps)
+        self.outputs_exist = outputs_exist or (lambda output: True)
+
+
+class Pipeline:
+    """Runs the stage graph for every unit, each stage as soon as that unit's dependencies finish.
+
+    Units do not wait for each other: one restaurant can be embedding while
+    others are still being scraped. A failed stage is reported and its
+    dependents are skipped; nothing is checkpointed for them, so the next
+    run retries exactly those.
+    """
+
+    def __init__(self, stages, checkpoints, force=()):
+        self.stages = {stage.name: stage for stage in stages}
+        self.checkpoints = checkpoints
+        self.force = set(force)
+        self.stats = {stage.name: {"ran": 0, "skipped": 0, "failed": 0, "blocked": 0} for stage in stages}
+        self._lock = threading.Lock()
+        # Fingerprints and checkpoint lookups are cheap; they run here rather than in the stage executors
+        self._control = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline")
+
+    def _count(self, stage, outcome):
+        with self._lock:
+            self.stats[stage][outcome] += 1
+
+    def run(self, units):
+        """{unit: {stage: Future}} for every unit; wait on them for the outputs"""
+        futures = {}
+        for unit in units:
+            futures[unit] = {name: Future() for name in self.stages}
+            for stage in self.stages.values():
+                self._when_done([futures[unit][dep] for dep in stage.deps],
+                                lambda unit=unit, stage=stage: self._start(unit, stage, futures[unit]))
+        return futures
+
+    @staticmethod
+    def _when_done(deps, callback):
+        if not deps:
+            callback()
+            return
+        remaining = [len(deps)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                callback()
+        for dep in deps:
+            dep.add_done_callback(done)
+
+    def _start(self, unit, stage, unit_futures):
+        target = unit_futures[stage.name]
+        failed = [dep for dep in stage.deps if unit_futures[dep].exception() is not None]
+        if failed:
+            self._count(stage.name, "blocked")
+            target.set_exception(RuntimeError(f"{stage.name} skipped: {', '.join(failed)} failed"))
+            return
+        inputs = {dep: unit_futures[dep].result() for dep in stage.deps}
+        self._control.submit(self._prepare, unit, stage, inputs, target)
+
+    def _prepare(self, unit, stage, inputs, target):
+        try:
+            fingerprint = stage.fingerprint(unit, inputs)
+            entry = self.checkpoints.get(unit, stage.name)
+            if (stage.name not in self.force and entry is not None and entry["fingerprint"] == fingerprint
+                    and stage.outputs_exist(entry["output"])):
+                self._count(stage.name, "skipped")
+                target.set_result(entry["output"])
+                return
+            future = stage.executor.submit(stage.run, unit, inputs)
+        except Exception as e:
+            self._fail(unit, stage, target, e)
+            return
+        future.add_done_callback(lambda f: self._finish(unit, stage, fingerprint, f, target))
+
+    def _finish(self, unit, stage, fingerprint, future, target):
+        error = future.exception()
+        if error is not None:
+            self._fail(unit, stage, target, error)
+            return
+        output = future.result()
+        self.checkpoints.record(unit, stage.name, fingerprint, output)
+        self._count(stage.name, "ran")
+        target.set_result(output)
+
+    def _fail(self, unit, stage, target, error):
+        print(f"[{stage.name}] {unit}: {type(error).__name__}: {error}")
+        self._count(stage.name, "failed")
+        target.set_exception(error)
+
+    def shutdown(self):
+        self._control.shutdown()
+
+
+# --- Stage functions (module level so process pools can pickle them) ---
+
+def scrape_restaurant(url, client, max_reviews=MAX_REVIEWS):
+    """Scrape one restaurant's info, menu and reviews; returns the paths they were saved to"""
+    from info_scraper import get_info, INFO_COLUMNS
+    from menu_scraper import get_menu
+    from review_scraper import get_reviews
+
+    info = dict(zip(INFO_COLUMNS, get_info(url, client)))
+    if not info['Name']:
+        raise RuntimeError("no restaurant info found")
+    file_manifest.record(url, name=info['Name'])
+    get_menu(url, client=client)
+    get_reviews(url, max_reviews=max_reviews, sort="popular", save=True, client=client)
+
+    files = file_manifest.recorded(url)
+    info_path = _state_path('info', file_manifest.url_slug(url))
+    write_json(info_path, info)
+    return {
+        "info": info_path,
+        "menu": os.path.join(file_manifest.MENU_DIR, files["menu"]) if files.get("menu") else None,
+        "reviews": os.path.join(file_manifest.REVIEWS_DIR, files["reviews"]) if files.get("reviews") else None,
+    }
+
+
+def enhance_stage(unit, inputs):
+    from enhance_menu_data import enhance_menu_file
+    menu = inputs["scrape"]["menu"]
+    if menu is None:
+        return {"menu": None}
+    os.makedirs(file_manifest.ENHANCED_MENU_DIR, exist_ok=True)
+    output = os.path.join(file_manifest.ENHANCED_MENU_DIR, os.path.basename(menu))
+    message = enhance_menu_file(menu, output)
+    if not message.startswith("Successfully"):
+        raise RuntimeError(message)
+    return {"menu": output}
+
+
+def _restaurant_record(info_path):
+    """The scraped info as its Restaurants.csv row reads back (NaN for missing values, numbers as floats).
+
+    Types are fixed rather than inferred: from a single row pandas would
+    read a phone number such as "+9180..." as an integer.
+    """
+    frame = pd.read_csv(io.StringIO(pd.DataFrame([read_json(info_path)]).to_csv(index=False)),
+                        dtype={column: float if column in NUMERIC_INFO_COLUMNS else str
+                               for column in read_json(info_path)})
+    return frame.astype(object).to_dict('records')[0]
+
+
+def document_stage(unit, inputs):
+    from build_knowledge_base import build_restaurant_documents
+    restaurant, documents = build_restaurant_documents(
+        _restaurant_record(inputs["scrape"]["info"]), inputs["enhance"]["menu"], inputs["scrape"]["reviews"]
+    )
+    output = _state_path('documents', unit)
+    write_json(output, {"restaurant": restaurant, "documents": documents})
+    return {"documents": output}
+
+
+class DocumentEmbedder:
+    """Embeds the documents of many restaurants per encoder call, on one thread that owns the model"""
+
+    def __init__(self, model_name, max_batch=EMBED_BATCH_RESTAURANTS, max_wait_ms=EMBED_MAX_WAIT_MS):
+        from rag_server import MicroBatcher
+        self.model_name = model_name
+        self.model = None
+        self.batcher = MicroBatcher(self._embed_batch, max_batch, max_wait_ms, name="embed-batcher")
+
+    def _embed_batch(self, items):
+        if self.model is None:
+            # Loaded on the first batch so scraping starts right away
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
+        documents = [read_json(path)["documents"] for _, path in items]
+        texts = [doc["content"] for docs in documents for doc in docs]
+        vectors = np.asarray(self.model.encode(texts, batch_size=64), dtype='float32') if texts else None
+
+        outputs, start = [], 0
+        for (unit, _), docs in zip(items, documents):
+            output = _state_path('embeddings', unit, '.npy')
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            save_array(output, vectors[start:start + len(docs)] if docs else np.zeros((0, 384), dtype='float32'))
+            start += len(docs)
+            outputs.append({"embeddings": output})
+        return outputs
+
+    def run(self, unit, inputs):
+        return self.batcher.submit((unit, inputs["document"]["documents"])).result()
+
+
+def _paths_exist(output):
+    return all(path is None or os.path.exists(path) for path in output.values())
+
+
+def build_pipeline(urls, client, checkpoints, scrape_executor, cpu_executor, embed_executor, embedder,
+                   max_reviews=MAX_REVIEWS, rescrape=False, force=()):
+    """scrape -> enhance -> document -> embed, with the URL's slug as the unit"""
+    url_of = {file_manifest.url_slug(url): url for url in urls}
+    # Scraped pages can change at any time; without --rescrape a finished scrape is reused
+    if rescrape:
+        scrape_fingerprint = lambda unit, inputs: os.urandom(8).hex()
+    else:
+        scrape_fingerprint = lambda unit, inputs: None
+    stages = [
+        Stage('scrape', lambda unit, inputs: scrape_restaurant(url_of[unit], client, max_reviews), scrape_fingerprint,
+              scrape_executor, outputs_exist=_paths_exist),
+        Stage('enhance', enhance_stage, lambda unit, inputs: file_hash(inputs["scrape"]["menu"]),
+              cpu_executor, deps=['scrape'], outputs_exist=_paths_exist),
+        Stage('document', document_stage,
+              lambda unit, inputs: file_hash(inputs["scrape"]["info"], inputs["enhance"]["menu"],
+                                             inputs["scrape"]["reviews"]),
+              cpu_executor, deps=['scrape', 'enhance'], outputs_exist=_paths_exist),
+        Stage('embed', embedder.run,
+              lambda unit, inputs: embedder.model_name + ':' + file_hash(inputs["document"]["documents"]),
+              embed_executor, deps=['document'], outputs_exist=_paths_exist),
+    ]
+    return Pipeline(stages, checkpoints, force)
+
+
+def build_outputs(units, checkpoints, index_type='flat', params=None, force=False):
+    """Concatenate every finished restaurant, in URL order, into the knowledge base files and indexes"""
+    finished = [unit for unit in units if checkpoints.get(unit, 'embed') is not None]
+    fingerprint = hashlib.sha1(json.dumps([
+        [checkpoints.get(unit, 'embed')["fingerprint"] for unit in finished],
+        [checkpoints.get(unit, 'scrape')["output"]["info"] for unit in finished],
+        index_type, params
+    ]).encode('utf-8')).hexdigest()
+    entry = checkpoints.get(ALL_UNITS, 'index')
+    if not force and entry is not None and entry["fingerprint"] == fingerprint \
+            and all(os.path.exists(path) for path in entry["output"]):
+        print("Knowledge base and indexes are up to date.")
+        return False
+    if not finished:
+        print("No restaurant finished every stage; nothing to index.")
+        return False
+
+    knowledge_base, documents, embeddings, infos = [], [], [], []
+    for unit in finished:
+        built = read_json(checkpoints.get(unit, 'document')["output"]["documents"])
+        knowledge_base.append(built["restaurant"])
+        documents.extend(built["documents"])
+        embeddings.append(np.load(checkpoints.get(unit, 'embed')["output"]["embeddings"]))
+        infos.append(read_json(checkpoints.get(unit, 'scrape')["output"]["info"]))
+
+    from info_scraper import INFO_COLUMNS
+    replace_file('Restaurants.csv', lambda tmp_path: pd.DataFrame(infos, columns=INFO_COLUMNS).to_csv(tmp_path, index=False))
+    os.makedirs('knowledge_base', exist_ok=True)
+    write_json('knowledge_base/restaurant_data.json', knowledge_base)
+    write_json('knowledge_base/documents.json', documents)
+    print(f"Indexing {len(documents)} documents from {len(finished)} restaurants...")
+    build_indexes(documents, np.vstack(embeddings), index_type, params)
+
+    outputs = ['Restaurants.csv', 'knowledge_base/restaurant_data.json', 'knowledge_base/documents.json',
+               'knowledge_base/embeddings.npy', 'knowledge_base/faiss_index.bin']
+    checkpoints.record(ALL_UNITS, 'index', fingerprint, outputs)
+    return True
+
+
+def run_pipeline(urls, index_type='flat', params=None, workers=None, scrape_workers=8,
+                 max_per_host=4, rate=2.0, max_reviews=MAX_REVIEWS, rescrape=False, force=(),
+                 model_name='all-MiniLM-L6-v2'):
+    from scrape_engine import ScrapeClient
+    from http_cache import HTTPCache, HTTP_CACHE_DIR
+
+    checkpoints = CheckpointStore()
+    units = [file_manifest.url_slug(url) for url in urls]
+
+    # Spawned workers: forking a process that runs scraper and encoder threads is not safe
+    with ScrapeClient(max_per_host=max_per_host, rate=rate, cache=HTTPCache(HTTP_CACHE_DIR)) as client, \
+            ThreadPoolExecutor(max_workers=scrape_workers, thread_name_prefix="scrape") as scrape_executor, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as cpu_executor, \
+            ThreadPoolExecutor(max_workers=2 * EMBED_BATCH_RESTAURANTS, thread_name_prefix="embed") as embed_executor:
+        embedder = DocumentEmbedder(model_name)
+        pipeline = build_pipeline(urls, client, checkpoints, scrape_executor, cpu_executor, embed_executor,
+                                  embedder, max_reviews, rescrape, force)
+        futures = pipeline.run(units)
+        for unit in units:
+            try:
+                futures[unit]['embed'].result()
+            except Exception:
+                pass
+        pipeline.shutdown()
+
+    for stage, counts in pipeline.stats.items():
+        print(f"{stage:>9}: {counts['ran']} ran, {counts['skipped']} skipped, {counts['failed']} failed, "
+              f"{counts['blocked']} blocked")
+    build_outputs(units, checkpoints, index_type, params, force='index' in force)
+    checkpoints.compact()
+    file_manifest.compact()
+
+
+if __name__ == "__main__":
+    from main import RESTAURANT_URLS
+    parser = argparse.ArgumentParser(
+        description="Scrape, enhance, document and embed restaurants as one resumable pipeline"
+    )
+    parser.add_argument('--urls', help="File with one restaurant URL per line (default: the list in main.py)")
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat')
+    parser.add_argument('--workers', type=int, help="Processes for the enhance and document stages")
+    parser.add_argument('--scrape-workers', type=int, default=8, help="Restaurants scraped concurrently")
+    parser.add_argument('--max-reviews', type=int, default=MAX_REVIEWS)
+    parser.add_argument('--rescrape', action='store_true', help="Scrape again even where a scrape finished")
+    parser.add_argument('--force', nargs='+', default=[], choices=['scrape', 'enhance', 'document', 'embed', 'index'],
+                        help="Re-run these stages even when their inputs are unchanged")
+    args = parser.parse_args()
+
+    urls = RESTAURANT_URLS
+    if args.urls:
+        with open(args.urls, 'r', encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip()]
+    run_pipeline(urls, args.index_type, workers=args.workers,
+                 scrape_workers=args.scrape_workers, max_reviews=args.max_reviews, rescrape=args.rescrape,
+                 force=args.force)
@@ -0,0 +1,113 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def normalize_query(text):
+    """Normalize query text so trivially different phrasings share a cache entry"""
+    text = re.sub(r'\s+', ' ', str(text)).strip().lower()
+    return text.rstrip('?!. ')
+
+
+class LRUCache:
+    """Bounded LRU cache with optional TTL and hit/miss counters"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at <= self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class QueryCache:
+    """Layered cache for query embeddings, retrieved doc ids and generated answers.
+
+    All layers are cleared as soon as one of the watched knowledge base files
+    changes on disk, so answers built from an old index are never served.
+    """
+
+    def __init__(self, watch_paths, maxsize=1024, ttl=None):
+        self.watch_paths = list(watch_paths)
+        self.embeddings = LRUCache(maxsize, ttl)
+        self.retrievals = LRUCache(maxsize, ttl)
+        self.answers = LRUCache(maxsize, ttl)
+        self.invalidations = 0
+        self._signature = self._current_signature()
+
+    def _current_signature(self):
+        signature = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def sources_changed(self):
+        """Clear every layer if a watched file changed; returns True when it did"""
+        signature = self._current_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        self.clear()
+        self.invalidations += 1
+        return True
+
+    def clear(self):
+        self.embeddings.clear()
+        self.retrievals.clear()
+        self.answers.clear()
+
+    def stats(self):
+        return {
+            "embeddings": self.embeddings.stats(),
+            "retrievals": self.retrievals.stats(),
+            "answers": self.answers.stats(),
+            "invalidations": self.invalidations
+        }
@@ -1,53 +1,420 @@
+import os
+import threading
 import numpy as np
 import json
 import faiss
 import re
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
+from transformers import TextIteratorStreamer
+from rag_cache import QueryCache, normalize_query
+from create_embeddings import load_index_manifest, apply_search_params, rescore, _base_index, VECTOR_IDS_PATH
+from metadata_filter import MetadataIndex, filter_key
+from bm25_index import BM25Index, BM25_INDEX_PATH, reciprocal_rank_fusion
+from doc_store import DocumentStore, DOC_STORE_DIR, STORE_MANIFEST
+from context_budget import ContextBudgeter, MAX_INPUT_TOKENS
+from reranker import CrossEncoderReranker, RERANK_CANDIDATES, RERANK_BUDGET_MS
+from inference_backend import resolve_backend, load_embedder, load_generator
+from metrics import NullMetrics
+from conversation_memory import ConversationMemory, is_follow_up, MAX_TURNS, SESSION_IDLE_SECONDS
+
+DOCUMENTS_PATH = 'knowledge_base/documents.json'
+EMBEDDINGS_PATH = 'knowledge_base/embeddings.npy'
+INDEX_PATH = 'knowledge_base/faiss_index.bin'
+
+# Filtered searches over at most this many candidates are scored exactly in numpy
+EXACT_SEARCH_THRESHOLD = 4096
+# Each side of hybrid retrieval contributes this many candidates per result to the fusion
+HYBRID_CANDIDATE_FACTOR = 4
+# Documents retrieved per question; the context budgeter keeps the ones that fit the prompt
+CONTEXT_CANDIDATES = 5
+# Re-ranked candidates are precise enough that fewer of them go to the generator
+RERANKED_CONTEXT_CANDIDATES = 3
+# A streamed answer fails instead of waiting forever when generation stalls this long between chunks
+STREAM_TIMEOUT_SECONDS = 60
 
 class RestaurantRAG:
-    def __init__(self):
+    def __init__(self, cache_size=1024, cache_ttl=None, nprobe=None, ef_search=None, parse_filters=True,
+                 hybrid=True, mmap_index=False, max_input_tokens=MAX_INPUT_TOKENS, rerank=False,
+                 rerank_candidates=RERANK_CANDIDATES, rerank_budget_ms=RERANK_BUDGET_MS, max_turns=MAX_TURNS,
+                 session_idle_seconds=SESSION_IDLE_SECONDS, backend=None, rescore_factor=None, metrics=None):
+        # Derive metadata filters from the question when the caller passes none
+        self.parse_filters = parse_filters
+        # Fuse BM25 with dense results when a sparse index has been built
+        self.hybrid = hybrid
+        # Query-time ANN knobs; None falls back to the values in the index manifest
+        self.search_overrides = {"nprobe": nprobe, "efSearch": ef_search, "rescore_factor": rescore_factor}
+        # Map the FAISS index read-only so worker processes share its pages instead of each holding a copy
+        self.mmap_index = mmap_index
+
+        # Stage timers, counters and histograms; pass a metrics.Metrics to record them
+        self.metrics = metrics if metrics is not None else NullMetrics()
+
         # Load knowledge base components
-        with open('knowledge_base/documents.json', 'r') as f:
-            self.documents = json.load(f)
-        self.embeddings = np.load('knowledge_base/embeddings.npy')
-        self.index = faiss.read_index('knowledge_base/faiss_index.bin')
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
-        self.generator = pipeline(
-            "text2text-generation",
-            model="google/flan-t5-base",
-            device_map="auto"
+        self._load_knowledge_base()
+        # torch, int8, onnx or onnx-int8; defaults to $RAG_INFERENCE_BACKEND, then fp32 torch
+        self.backend = resolve_backend(backend)
+        self.embedder = load_embedder(self.backend)
+        self.generator = load_generator(self.backend)
+        self.context_budgeter = ContextBudgeter(self.generator.tokenizer, self._build_prompt, max_input_tokens)
+        # Optional second stage: re-score rerank_candidates FAISS hits with a cross-encoder
+        self.reranker = CrossEncoderReranker(budget_ms=rerank_budget_ms) if rerank else None
+        self.rerank_candidates = rerank_candidates
+        self.context_candidates = RERANKED_CONTEXT_CANDIDATES if rerank else CONTEXT_CANDIDATES
+
+        # Cache is invalidated whenever the index or documents are rebuilt
+        self.cache = QueryCache([INDEX_PATH, DOCUMENTS_PATH, BM25_INDEX_PATH, os.path.join(DOC_STORE_DIR, STORE_MANIFEST)],
+                                maxsize=cache_size, ttl=cache_ttl)
+        # Conversation state per session_id; calls without one are stateless
+        self.memory = ConversationMemory(max_turns, session_idle_seconds)
+        self.metrics.add_collector(self._collect_metrics)
+
+    def _load_knowledge_base(self):
+        # The memory-mapped store decodes documents on access and shares its pages between
+        # worker processes; documents.json is only parsed when no store has been built
+        if DocumentStore.exists():
+            self.documents = DocumentStore()
+        else:
+            with open(DOCUMENTS_PATH, 'r') as f:
+                self.documents = json.load(f)
+        # Re-scoring and exact filtered search always use the float32 vectors, whatever the
+        # store's embedding dtype
+        self.embeddings = np.load(EMBEDDINGS_PATH, mmap_mode='r')
+        self.metadata_index = MetadataIndex(self.documents)
+        self.sparse_index = BM25Index.load(BM25_INDEX_PATH) if os.path.exists(BM25_INDEX_PATH) else None
+        self.index = self._read_index()
+        self.index_manifest = load_index_manifest()
+        search_params = dict(self.index_manifest.get("params", {}))
+        search_params.update({key: value for key, value in self.search_overrides.items() if value is not None})
+        apply_search_params(self.index, search_params)
+        # IndexPQ cannot search with an id selector; filtered searches over it are exact instead
+        self.selector_search = not isinstance(_base_index(self.index), faiss.IndexPQ)
+        # Compressed indexes return rescore_factor x candidates, re-ranked against the full-precision embeddings
+        self.rescore_factor = int(search_params.get("rescore_factor") or 0)
+
+        # Incremental rebuilds give vectors stable ids that no longer match document positions
+        self.vector_ids = None
+        self.position_of_id = None
+        if os.path.exists(VECTOR_IDS_PATH):
+            vector_ids = np.load(VECTOR_IDS_PATH)
+            if not np.array_equal(vector_ids, np.arange(len(vector_ids))):
+                self.vector_ids = vector_ids
+                self.position_of_id = np.full(int(vector_ids.max()) + 1, -1, dtype='int64')
+                self.position_of_id[vector_ids] = np.arange(len(vector_ids))
+
+    def _read_index(self):
+        if self.mmap_index:
+            # MMAP_IFC (newer FAISS) also maps flat vector storage, not only IVF inverted lists
+            flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+            try:
+                return faiss.read_index(INDEX_PATH, flags)
+            except RuntimeError as e:
+                print(f"Could not memory-map {INDEX_PATH} ({e}), loading it into memory")
+        return faiss.read_index(INDEX_PATH)
+
+    def _refresh_if_stale(self):
+        """Reload the knowledge base if it was rebuilt since the cache was filled"""
+        if self.cache.sources_changed():
+            self._load_knowledge_base()
+            if getattr(self, 'reranker', None) is not None:
+                self.reranker.clear()
+
+    def _embed_batch(self, queries):
+        """Embed queries, encoding only the normalized texts not already cached"""
+        keys = [normalize_query(query) for query in queries]
+        vectors = [self.cache.embeddings.get(key) for key in keys]
+
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            with self.metrics.time('embed'):
+                encoded = self.embedder.encode(missing, convert_to_numpy=True)
+            encoded = dict(zip(missing, np.asarray(encoded, dtype='float32')))
+            for key, vector in encoded.items():
+                self.cache.embeddings.put(key, vector)
+            vectors = [encoded[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return np.vstack(vectors).astype('float32')
+
+    def _resolve_filters(self, question, filters, session=None):
+        """Use explicit filters as given; parsed ones are dropped if nothing matches them"""
+        if filters is not None or not self.parse_filters:
+            return filters
+        parsed = self.metadata_index.parse_filters(question)
+        # A follow-up that names no place stays on the restaurant the conversation is about
+        if session is not None and session.focus and 'restaurant' not in parsed and 'location' not in parsed \
+                and is_follow_up(question):
+            parsed['restaurant'] = session.focus
+        if parsed and self.metadata_index.mask(parsed).any():
+            return parsed
+        return None
+
+    def _exact_search(self, query_embeddings, candidates, top_k):
+        """Exact L2 ranking of the candidate positions against the full-precision embeddings"""
+        vectors = np.asarray(self.embeddings[candidates], dtype='float32')
+        distances = (
+            (query_embeddings ** 2).sum(axis=1)[:, None]
+            - 2 * query_embeddings @ vectors.T
+            + (vectors ** 2).sum(axis=1)[None, :]
         )
+        k = min(top_k, len(candidates))
+        order = np.argsort(distances, axis=1)[:, :k]
+        return [
+            [(int(candidates[j]), float(row[j])) for j in row_order]
+            for row, row_order in zip(distances, order)
+        ]
 
-        self.conversation_history = []
+    def _search(self, query_embeddings, top_k, filters=None):
+        """Search the index, restricted to documents matching the metadata filters"""
+        params = None
+        if filters:
+            candidates = np.flatnonzero(self.metadata_index.mask(filters))
+            if len(candidates) == 0:
+                return [[] for _ in query_embeddings]
+            # Cheaper to score a small candidate set exactly than to walk the index
+            if len(candidates) <= EXACT_SEARCH_THRESHOLD or not self.selector_search:
+                return self._exact_search(query_embeddings, candidates, top_k)
+            ids = candidates if self.vector_ids is None else self.vector_ids[candidates]
+            selector = faiss.IDSelectorBatch(ids.astype('int64'))
+            # IVF indexes need IVF parameters, which otherwise default to nprobe=1
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+            else:
+                params = faiss.SearchParameters(sel=selector)
 
-    def _retrieve(self, query, top_k=5):
-        query_embedding = self.embedder.encode([query])
-        distances, indices = self.index.search(query_embedding, top_k)
-        results = []
-        for idx in indices[0]:
-            doc = self.documents[idx]
-            results.append(doc["content"])
-        return results
+        search_k = top_k * self.rescore_factor if self.rescore_factor > 1 else top_k
+        distances, indices = self.index.search(query_embeddings, search_k, params=params)
+        if self.position_of_id is not None:
+            indices = np.where(indices >= 0, self.position_of_id[np.maximum(indices, 0)], -1)
+        if search_k != top_k:
+            distances, indices = rescore(query_embeddings, indices, self.embeddings, top_k)
+        # FAISS pads with -1 when fewer than top_k vectors qualify
+        return [
+            [(int(idx), float(distance)) for distance, idx in zip(row_distances, row_indices) if idx >= 0]
+            for row_distances, row_indices in zip(distances, indices)
+        ]
 
-    def query(self, question):
-        # Retrieve relevant context
-        context_docs = self._retrieve(question, top_k=5)
+    def _observe_distances(self, ranked_lists):
+        if self.metrics.enabled:
+            for ranked in ranked_lists:
+                for _, distance in ranked:
+                    self.metrics.observe('rag_retrieved_distance', distance)
+
+    def _hybrid_search(self, queries, query_embeddings, top_k, filters=None):
+        """Fuse dense and BM25 rankings with reciprocal-rank fusion"""
+        candidate_k = top_k * HYBRID_CANDIDATE_FACTOR
+        mask = self.metadata_index.mask(filters) if filters else None
+        dense = self._search(query_embeddings, candidate_k, filters)
+        self._observe_distances(dense)
+        return [
+            reciprocal_rank_fusion([dense_ranked, self.sparse_index.search(query, candidate_k, mask)], top_k)
+            for query, dense_ranked in zip(queries, dense)
+        ]
+
+    def retrieve_batch(self, queries, top_k=5, filters=None):
+        """Retrieve ranked (document, score) pairs for several queries at once.
+
+        Scores are L2 distances (lower is better) for dense-only retrieval and
+        reciprocal-rank fusion scores (higher is better) in hybrid mode.
+        `filters` is a metadata filter dict applied to every query, or a list
+        with one filter dict (or None) per query.
+        """
+        if not queries:
+            return []
+        self._refresh_if_stale()
+        filters = filters if isinstance(filters, list) else [filters] * len(queries)
+        hybrid = self.hybrid and self.sparse_index is not None
+
+        # One encoder pass for every query not served from cache
+        query_embeddings = self._embed_batch(queries)
+        keys = [
+            (embedding.tobytes(), top_k, filter_key(query_filters), normalize_query(query) if hybrid else None)
+            for query, embedding, query_filters in zip(queries, query_embeddings, filters)
+        ]
+        ranked_ids = [self.cache.retrievals.get(key) for key in keys]
+
+        # One FAISS search per distinct filter among the cache misses
+        groups = {}
+        for i, ranked in enumerate(ranked_ids):
+            if ranked is None:
+                groups.setdefault(keys[i][2], []).append(i)
+        self.metrics.inc('rag_retrievals_total', len(queries))
+        for rows in groups.values():
+            with self.metrics.time('search'):
+                if hybrid:
+                    results = self._hybrid_search([queries[i] for i in rows], query_embeddings[rows], top_k,
+                                                  filters[rows[0]])
+                else:
+                    results = self._search(query_embeddings[rows], top_k, filters[rows[0]])
+                    self._observe_distances(results)
+            for i, ranked in zip(rows, results):
+                self.cache.retrievals.put(keys[i], ranked)
+                ranked_ids[i] = ranked
+
+        return [
+            [(self.documents[idx], distance) for idx, distance in ranked]
+            for ranked in ranked_ids
+        ]
+
+    def _build_prompt(self, question, context_docs, history=None):
         context = "\n\n".join(context_docs)
-        prompt = (
+        conversation = f"Conversation so far:\n{history}\n\n" if history else ""
+        return (
+            f"{conversation}"
             f"Context: {context}\n\n"
             f"Question: {question}\n"
             f"Answer:"
         )
 
-        response = self.generator(
-            prompt,
-            max_length=256,
-            num_return_sequences=1,
-            temperature=0.3
-        )[0]['generated_text']
-        answer = response.strip().split("Answer:")[-1].strip()
-        self.conversation_history.append((question, answer))
+    def _extract_answer(self, response):
+        return response.strip().split("Answer:")[-1].strip()
+
+    def _rank_for_context(self, questions, top_k, filters):
+        """Documents for each question's prompt: retrieved, then re-ranked when enabled"""
+        if self.reranker is None:
+            return self.retrieve_batch(questions, top_k=top_k, filters=filters)
+        candidates = self.retrieve_batch(questions, top_k=max(top_k, self.rerank_candidates), filters=filters)
+        with self.metrics.time('rerank'):
+            return self.reranker.rerank_batch(questions, candidates, top_k)
+
+    def _history(self, session):
+        """Recent turns of a session, trimmed to the history token budget"""
+        return self.context_budgeter.history(session.history_lines()) if session is not None else None
+
+    def _prompts(self, questions, top_k, filters, session_ids):
+        """Prompts for the questions, and the filters their documents were retrieved with"""
+        sessions = [None if sid is None else self.memory.get(sid) for sid in session_ids]
+        filters = [self._resolve_filters(q, f, session) for q, f, session in zip(questions, filters, sessions)]
+        retrieved = self._rank_for_context(questions, top_k, filters)
+        prompts = []
+        with self.metrics.time('context'):
+            for question, ranked, session in zip(questions, retrieved, sessions):
+                history = self._history(session)
+                context = self.context_budgeter.assemble(question, [doc for doc, _ in ranked], history)
+                prompts.append(self._build_prompt(question, context, history))
+        self.metrics.inc('rag_questions_total', len(questions))
+        if self.metrics.enabled:
+            for prompt in prompts:
+                self.metrics.observe('rag_prompt_tokens', self.context_budgeter.count(prompt))
+        return prompts, filters
+
+    def _remember(self, session_id, question, answer, filters):
+        if session_id is not None:
+            self.memory.record(session_id, question, answer, filters)
+
+    def query(self, question, filters=None, session_id=None):
+        # Retrieve relevant context
+        prompts, filters = self._prompts([question], self.context_candidates, [filters], [session_id])
+        prompt = prompts[0]
+
+        answer = self.cache.answers.get(prompt)
+        if answer is None:
+            with self.metrics.time('generate'):
+                response = self.generator(
+                    prompt,
+                    max_length=256,
+                    num_return_sequences=1,
+                    temperature=0.3
+                )[0]['generated_text']
+            answer = self._extract_answer(response)
+            self.cache.answers.put(prompt, answer)
+        self._remember(session_id, question, answer, filters[0])
         return answer
 
+    def query_stream(self, question, filters=None, session_id=None):
+        """Like query, but yields answer text chunks as flan-t5 decodes them"""
+        prompts, filters = self._prompts([question], self.context_candidates, [filters], [session_id])
+        prompt = prompts[0]
+
+        answer = self.cache.answers.get(prompt)
+        if answer is not None:
+            yield answer
+        else:
+            tokenizer = self.generator.tokenizer
+            model = self.generator.model
+            inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+            streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                            timeout=STREAM_TIMEOUT_SECONDS)
+            errors = []
+
+            def generate():
+                # The streamer must be ended even when generate() fails, or the loop below never stops
+                try:
+                    model.generate(**inputs, streamer=streamer, max_length=256, num_return_sequences=1,
+                                   temperature=0.3)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    streamer.end()
+
+            # generate() blocks, so it runs in a worker thread while we drain the streamer
+            worker = threading.Thread(target=generate)
+            # Includes the time the caller spends consuming chunks
+            with self.metrics.time('generate'):
+                worker.start()
+                # Whitespace is held back until more text follows, so the streamed text is the stripped answer
+                chunks, pending = [], ""
+                for chunk in streamer:
+                    text = pending + chunk if chunks else (pending + chunk).lstrip()
+                    body = text.rstrip()
+                    pending = text[len(body):]
+                    if body:
+                        chunks.append(body)
+                        yield body
+                worker.join()
+            if errors:
+                raise errors[0]
+
+            # Cache and remember exactly the text that was streamed, so a repeated question gets the same answer
+            answer = "".join(chunks)
+            self.cache.answers.put(prompt, answer)
+        self._remember(session_id, question, answer, filters[0])
+
+    def query_batch(self, questions, top_k=None, batch_size=8, filters=None, session_ids=None):
+        """Answer a list of questions with batched retrieval and generation"""
+        questions = list(questions)
+        if not questions:
+            return []
+
+        filters = filters if isinstance(filters, list) else [filters] * len(questions)
+        session_ids = session_ids if session_ids is not None else [None] * len(questions)
+        prompts, filters = self._prompts(questions, top_k or self.context_candidates, filters, session_ids)
+
+        answers = [self.cache.answers.get(prompt) for prompt in prompts]
+        missing = list(dict.fromkeys(prompt for prompt, answer in zip(prompts, answers) if answer is None))
+        if missing:
+            with self.metrics.time('generate'):
+                responses = self.generator(
+                    missing,
+                    max_length=256,
+                    num_return_sequences=1,
+                    temperature=0.3,
+                    batch_size=batch_size
+                )
+            generated = {
+                prompt: self._extract_answer(response['generated_text'])
+                for prompt, response in zip(missing, responses)
+            }
+            for prompt, answer in generated.items():
+                self.cache.answers.put(prompt, answer)
+            answers = [generated[prompt] if answer is None else answer for prompt, answer in zip(prompts, answers)]
+
+        for session_id, question, answer, f in zip(session_ids, questions, answers, filters):
+            self._remember(session_id, question, answer, f)
+        return answers
+
+    def cache_stats(self):
+        stats = {**self.cache.stats(), "context_tokens": self.context_budgeter.stats(), "sessions": self.memory.stats()}
+        if self.reranker is not None:
+            stats["rerank"] = self.reranker.cache_stats()
+        return stats
 
+    def _collect_metrics(self):
+        """Cache counters and knowledge base sizes, read when metrics are rendered"""
+        stats = self.cache.stats()
+        for layer in ('embeddings', 'retrievals', 'answers'):
+            yield 'rag_cache_hits_total', 'counter', stats[layer]['hits'], {'cache': layer}
+            yield 'rag_cache_misses_total', 'counter', stats[layer]['misses'], {'cache': layer}
+            yield 'rag_cache_entries', 'gauge', stats[layer]['size'], {'cache': layer}
+        yield 'rag_cache_invalidations_total', 'counter', stats['invalidations'], {}
+        yield 'rag_index_vectors', 'gauge', self.index.ntotal, {}
+        yield 'rag_documents', 'gauge', len(self.documents), {}
+        yield 'rag_sessions', 'gauge', len(self.memory), {}
@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import queue
+import signal
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from inference_backend import INFERENCE_BACKENDS, resolve_backend
+from metrics import Metrics, StackSampler
+from metadata_filter import FILTER_FIELDS, RANGE_FIELDS
+
+DEFAULT_PORT = 8080
+# Longest profile GET /debug/profile will take
+MAX_PROFILE_SECONDS = 60
+# Most documents POST /retrieve returns
+MAX_TOP_K = 100
+
+
+def validate_filters(filters):
+    """Reject malformed client filters before they are batched with other requests"""
+    if filters is None:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' must be an object")
+    for field, value in filters.items():
+        if field not in FILTER_FIELDS + RANGE_FIELDS + ('location',):
+            raise ValueError(f"unknown filter field {field!r}")
+        if field in RANGE_FIELDS:
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"filter {field!r} must be a number") from None
+    return filters
+
+
+class MicroBatcher:
+    """Groups concurrent requests into batches for a single worker thread.
+
+    The first request of a batch waits at most `max_wait_ms` for others to
+    arrive (or until `max_batch_size` are queued), then `batch_fn` is called
+    once with every queued item and must return one result per item. When
+    the batch call raises, the items are retried one at a time so only the
+    failing ones get the exception.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5.0, name="batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0}
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def submit(self, item):
+        """Queue an item; returns a Future for its result"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                for item, future in batch:
+                    try:
+                        future.set_result(self.batch_fn([item])[0])
+                    except Exception as item_error:
+                        future.set_exception(item_error)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def batch_queries(rag, items):
+    """Answer (question, filters, session_id) triples with one batched retrieval and generation pass"""
+    return rag.query_batch(
+        [question for question, _, _ in items], batch_size=len(items),
+        filters=[filters for _, filters, _ in items], session_ids=[session_id for _, _, session_id in items]
+    )
+
+
+def batch_retrievals(rag, items):
+    """Retrieve for (query, top_k, filters) triples; one batched search per distinct top_k"""
+    results = [None] * len(items)
+    by_top_k = {}
+    for i, (_, top_k, _) in enumerate(items):
+        by_top_k.setdefault(top_k, []).append(i)
+    for top_k, rows in by_top_k.items():
+        ranked = rag.retrieve_batch([items[i][0] for i in rows], top_k=top_k, filters=[items[i][2] for i in rows])
+        for i, documents in zip(rows, ranked):
+            results[i] = [dict(doc, score=score) for doc, score in documents]
+    return results
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    """JSON API: POST /query, POST /retrieve, GET /health, GET /stats, GET /metrics, GET /debug/profile"""
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text, content_type='text/plain; charset=utf-8'):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError("request body must be a JSON object")
+        return payload
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/metrics':
+            if not self.server.rag.metrics.enabled:
+                self._send_json(404, {"error": "metrics are disabled"})
+            else:
+                self._send_text(200, self.server.rag.metrics.render_prometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif url.path == '/debug/profile':
+            # Sample every thread of this worker for a while; the output feeds flamegraph.pl / speedscope
+            try:
+                seconds = float(parse_qs(url.query).get('seconds', ['5'])[0])
+            except ValueError:
+                seconds = None
+            # The range check is also False for nan and inf
+            if seconds is None or not 0 < seconds <= MAX_PROFILE_SECONDS:
+                self._send_json(400, {"error": f"'seconds' must be a number above 0 and at most {MAX_PROFILE_SECONDS}"})
+                return
+            sampler = StackSampler().start()
+            time.sleep(seconds)
+            self._send_text(200, sampler.stop().collapsed())
+        elif self.path == '/health':
+            self._send_json(200, {"status": "ok", "pid": os.getpid()})
+        elif self.path == '/stats':
+            self._send_json(200, {
+                "pid": os.getpid(),
+                "query_batches": self.server.query_batcher.stats,
+                "retrieve_batches": self.server.retrieve_batcher.stats,
+                "cache": self.server.rag.cache_stats()
+            })
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+            if self.path == '/query':
+                question = payload.get("question")
+                if not isinstance(question, str) or not question.strip():
+                    raise ValueError("'question' must be a non-empty string")
+                session_id = payload.get("session_id")
+                if session_id is not None and not isinstance(session_id, str):
+                    raise ValueError("'session_id' must be a string")
+                filters = validate_filters(payload.get("filters"))
+                future = self.server.query_batcher.submit((question, filters, session_id))
+                self._send_json(200, {"answer": future.result()})
+            elif self.path == '/retrieve':
+                query = payload.get("query")
+                if not isinstance(query, str) or not query.strip():
+                    raise ValueError("'query' must be a non-empty string")
+                top_k = payload.get("top_k", 5)
+                if isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= MAX_TOP_K:
+                    raise ValueError(f"'top_k' must be an integer from 1 to {MAX_TOP_K}")
+                filters = validate_filters(payload.get("filters"))
+                future = self.server.retrieve_batcher.submit((query, top_k, filters))
+                self._send_json(200, {"documents": future.result()})
+            else:
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_worker(server, workers, max_batch_size, max_wait_ms, metrics, rag_kwargs):
+    """Load the models in this process and attach batchers to the shared listening socket"""
+    try:
+        import torch
+        # Split the cores between workers instead of every worker using all of them
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
+    from rag_chatbot import RestaurantRAG
+
+    # Each worker keeps its own metrics; the worker label tells the scraped processes apart
+    rag = RestaurantRAG(mmap_index=True, metrics=Metrics(const_labels={"worker": os.getpid()}) if metrics else None,
+                        **rag_kwargs)
+    server.rag = rag
+    server.query_batcher = MicroBatcher(lambda items: batch_queries(rag, items), max_batch_size, max_wait_ms,
+                                        name="query-batcher")
+    server.retrieve_batcher = MicroBatcher(lambda items: batch_retrievals(rag, items), max_batch_size, max_wait_ms,
+                                           name="retrieve-batcher")
+    print(f"Worker {os.getpid()} ready")
+    server.serve_forever()
+
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, workers=1, max_batch_size=16, max_wait_ms=5.0, metrics=True,
+          **rag_kwargs):
+    """Serve RestaurantRAG over HTTP from `workers` pre-forked processes sharing one listening socket.
+
+    Each worker holds its own models but maps the FAISS index and document
+    store read-only, so those pages are shared between workers.
+    """
+    server = ThreadingHTTPServer((host, port), RAGRequestHandler)
+    server.daemon_threads = True
+    print(f"Serving RestaurantRAG at http://{host}:{server.server_address[1]} with {workers} worker(s)")
+    if workers == 1:
+        _start_worker(server, workers, max_batch_size, max_wait_ms, metrics, rag_kwargs)
+        return
+
+    # Models are loaded after the fork: each worker gets its own, the parent only supervises
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _start_worker(server, workers, max_batch_size, max_wait_ms, metrics, rag_kwargs)
+            finally:
+                os._exit(1)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+    server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for the restaurant chatbot")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes, each with its own models")
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="How long the first request of a batch waits for others")
+    parser.add_argument('--nprobe', type=int)
+    parser.add_argument('--ef-search', type=int)
+    parser.add_argument('--rerank', action='store_true', help="Re-rank retrieved documents with a cross-encoder")
+    parser.add_argument('--backend', choices=INFERENCE_BACKENDS,
+                        help="Model inference backend (default: $RAG_INFERENCE_BACKEND or torch)")
+    parser.add_argument('--no-metrics', action='store_true', help="Turn off instrumentation and GET /metrics")
+    args = parser.parse_args()
+    # Fail here rather than in every worker process
+    try:
+        resolve_backend(args.backend)
+    except (ValueError, ImportError) as e:
+        parser.error(str(e))
+    serve(args.host, args.port, args.workers, args.max_batch_size, args.max_wait_ms, not args.no_metrics,
+          nprobe=args.nprobe, ef_search=args.ef_search, rerank=args.rerank, backend=args.backend)
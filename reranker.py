@@ -0,0 +1,73 @@
+import time
+from rag_cache import LRUCache, normalize_query
+
+RERANK_MODEL = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+# FAISS candidates re-scored per question
+RERANK_CANDIDATES = 20
+# Skip re-ranking when scoring the uncached pairs is expected to take longer than this
+RERANK_BUDGET_MS = 200.0
+
+
+class CrossEncoderReranker:
+    """Second-stage re-ranking of retrieved documents with a small CPU cross-encoder.
+
+    Every (query, document) pair not already cached is scored in one batch.
+    Scores are cached per (normalized query, doc id), with the content in the
+    key too since ids are not unique and documents change on rebuilds. The
+    cost per pair is tracked as a moving average; when the uncached pairs of
+    a call would exceed the latency budget, the retrieval order is kept.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, budget_ms=RERANK_BUDGET_MS, cache_size=8192, batch_size=32):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device='cpu')
+        self.budget = budget_ms / 1000 if budget_ms is not None else None
+        self.batch_size = batch_size
+        self.scores = LRUCache(maxsize=cache_size)
+        self.seconds_per_pair = None
+        self.stats = {"calls": 0, "pairs_scored": 0, "skipped": 0}
+        # One throwaway prediction so one-off initialization is not mistaken for the per-pair cost
+        self.model.predict([("warm up", "warm up")])
+
+    def clear(self):
+        self.scores.clear()
+
+    def rerank_batch(self, queries, ranked_lists, top_k):
+        """Re-order each list of (doc, score) pairs by cross-encoder score; returns (doc, score) lists"""
+        self.stats["calls"] += 1
+        keys = [
+            [(normalize_query(query), doc.get("id"), doc["content"]) for doc, _ in ranked]
+            for query, ranked in zip(queries, ranked_lists)
+        ]
+        found = {}
+        for row in keys:
+            for key in row:
+                if key not in found:
+                    found[key] = self.scores.get(key)
+        missing = [key for key, score in found.items() if score is None]
+
+        if missing and self.budget is not None and self.seconds_per_pair is not None \
+                and len(missing) * self.seconds_per_pair > self.budget:
+            self.stats["skipped"] += 1
+            return [ranked[:top_k] for ranked in ranked_lists]
+
+        if missing:
+            start = time.perf_counter()
+            pairs = [(query_text, content) for query_text, _, content in missing]
+            for key, score in zip(missing, self.model.predict(pairs, batch_size=self.batch_size)):
+                found[key] = float(score)
+                self.scores.put(key, found[key])
+            per_pair = (time.perf_counter() - start) / len(missing)
+            self.seconds_per_pair = per_pair if self.seconds_per_pair is None else \
+                0.8 * self.seconds_per_pair + 0.2 * per_pair
+            self.stats["pairs_scored"] += len(missing)
+
+        return [
+            sorted(((doc, found[key]) for (doc, _), key in zip(ranked, row)),
+                   key=lambda item: item[1], reverse=True)[:top_k]
+            for ranked, row in zip(ranked_lists, keys)
+        ]
+
+    def cache_stats(self):
+        return {**self.stats, "cache": self.scores.stats(),
+                "ms_per_pair": None if self.seconds_per_pair is None else self.seconds_per_pair * 1000}
@@ -1,8 +1,9 @@
 import os
-import json
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup
+import file_manifest
+from scrape_engine import parse_response
+from page_extract import extract_ld_json, select_ld_json, extract_title, RESTAURANT_TYPES
 
 headers = {'User-Agent': 'Mozilla/5.0 (Macintosh;'
                          ' Intel Mac OS X 10_15_4)'
@@ -10,15 +11,14 @@ headers = {'User-Agent': 'Mozilla/5.0 (Macintosh;'
                          ' Chrome/83.0.4103.97 Safari/537.36'}
 
 
-def clean_reviews(html_text):
+def clean_reviews(page):
     """ Cleans and collect the review from the html """
     
     try:
-        reviews = html_text.find_all('script', type='application/ld+json')[1]
-        reviews_data = json.loads(reviews.string)
+        reviews_data = select_ld_json(extract_ld_json(page), types=RESTAURANT_TYPES, key='reviews')
         
         # Check if 'reviews' key exists
-        if 'reviews' not in reviews_data:
+        if reviews_data is None:
             print("No reviews found or JSON structure has changed.")
             return []
             
@@ -38,6 +38,13 @@ def clean_reviews(html_text):
 
 
 
+def parse_review_page(webpage):
+    """ Parse the page title and reviews out of a fetched review page """
+    
+    page = webpage.text
+    return {"title": extract_title(page) or "", "reviews": clean_reviews(page)}
+
+
 def save_df(file_name, df):
     """ Save the dataframe """
     
@@ -46,7 +53,7 @@ def save_df(file_name, df):
     df.to_csv(f"Reviews/{file_name}.csv", index=False)
 
 
-def get_reviews(url, max_reviews, sort='popular', save=True):
+def get_reviews(url, max_reviews, sort='popular', save=True, client=None):
     """ Get all Reviews from the passed url """
     
     global headers
@@ -64,16 +71,32 @@ def get_reviews(url, max_reviews, sort='popular', save=True):
 
     # Collecting the reviews
     try:
-        for i in range(1, max_reviews):
-            link = url+f"/reviews?page={i}{sort}"
-            webpage = requests.get(link, headers=headers, timeout=5)
-            html_text = BeautifulSoup(webpage.text, 'lxml')
-            rn = html_text.head.find('title').text
-            data = clean_reviews(html_text)
-            if not data or prev_data == data:
+        links = [url+f"/reviews?page={i}{sort}" for i in range(1, max_reviews)]
+        # With a pooled client, review pages are fetched a window at a time concurrently
+        window = client.max_per_host if client is not None else 1
+        done = False
+        for start in range(0, len(links), window):
+            batch = links[start:start+window]
+            if client is not None:
+                pages = client.fetch_all(batch, headers=headers, timeout=5)
+            else:
+                pages = [requests.get(batch[0], headers=headers, timeout=5)]
+            for webpage in pages:
+                if isinstance(webpage, Exception):
+                    raise webpage
+                if not webpage.ok:  # past the last review page
+                    done = True
+                    break
+                page = parse_response(client, webpage, 'reviews', parse_review_page)
+                rn = page["title"]
+                data = [tuple(review) for review in page["reviews"]]
+                if not data or prev_data == data:
+                    done = True
+                    break
+                reviews.extend(data)
+                prev_data = data
+            if done:
                 break
-            reviews.extend(data)
-            prev_data = data
         
         # Creating the DataFrame
         restaurant_name = rn[rn.find("User Reviews"):-1] if "User Reviews" in rn else rn.replace(" ", "_")
@@ -83,6 +106,7 @@ def get_reviews(url, max_reviews, sort='popular', save=True):
         # Saving the df
         if save and not review_df.empty:
             save_df(restaurant_name, review_df)
+            file_manifest.record(url, reviews=f"{restaurant_name}.csv")
         
         return review_df
     except Exception as e:
@@ -92,4 +116,5 @@ def get_reviews(url, max_reviews, sort='popular', save=True):
 
 
 if __name__ == "__main__":
-    get_reviews("https://www.zomato.com/bangalore/meghana-foods-marathahalli-bangalore", 70, sort='new')
\ No newline at end of file
+    get_reviews("https://www.zomato.com/bangalore/meghana-foods-marathahalli-bangalore", 70, sort='new')
+    file_manifest.compact()
\ No newline at end of file
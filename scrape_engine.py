@@ -0,0 +1,137 @@
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from stub_server import save_page
+
+headers = {'User-Agent': 'Mozilla/5.0 (Macintosh;'
+                         ' Intel Mac OS X 10_15_4)'
+                         ' AppleWebKit/537.36 (KHTML, like Gecko)'
+                         ' Chrome/83.0.4103.97 Safari/537.36'}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_response(client, response, kind, parse_fn):
+    """Parse a fetched page, skipping the work when the client's cache says it is unchanged"""
+    if client is None or client.cache is None:
+        return parse_fn(response)
+    return client.cache.parse(response, kind, parse_fn)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ScrapeClient:
+    """Pooled HTTP client shared by the scrapers.
+
+    One keep-alive requests.Session is reused for every page, each host gets a
+    concurrency cap and a token-bucket rate limit, and transient failures
+    (connection errors, timeouts, 429/5xx) are retried with exponential backoff.
+    With an HTTPCache, requests are sent conditionally and unchanged pages are
+    flagged so their parsed results can be reused. With a pages_dir, every
+    page fetched is also saved there for stub_server.py to replay.
+    """
+
+    def __init__(self, max_per_host=4, rate=2.0, burst=4, retries=3, backoff=0.5,
+                 timeout=5, max_workers=16, cache=None, pages_dir=None):
+        self.cache = cache
+        self.pages_dir = pages_dir
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape")
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_limits(self, url):
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = (threading.BoundedSemaphore(self.max_per_host),
+                                     TokenBucket(self.rate, self.burst))
+            return self._hosts[host]
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) * (1 + random.random())
+
+    def get(self, url, headers=None, timeout=None):
+        """GET a URL through the pooled session; mirrors requests.get for the scrapers"""
+        semaphore, bucket = self._host_limits(url)
+        if self.cache is not None:
+            headers = {**(headers or {}), **self.cache.conditional_headers(url)}
+        for attempt in range(self.retries + 1):
+            bucket.acquire()
+            try:
+                with semaphore:
+                    response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                time.sleep(self._retry_delay(attempt, response))
+                continue
+            if self.pages_dir is not None and response.status_code == 200:
+                save_page(url, response.text, self.pages_dir)
+            if self.cache is not None:
+                response = self.cache.resolve(url, response)
+            return response
+
+    def fetch_all(self, urls, headers=None, timeout=None):
+        """Fetch several URLs concurrently; returns responses (or exceptions) in input order"""
+        futures = [self.executor.submit(self.get, url, headers, timeout) for url in urls]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
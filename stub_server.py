@@ -0,0 +1,76 @@
+import os
+import re
+import time
+import hashlib
+import argparse
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PAGES_DIR = 'saved_pages'
+
+
+def page_path(url, pages_dir=PAGES_DIR):
+    """Map a Zomato URL (path + query) to the file a saved copy of it lives in"""
+    parts = urlsplit(url)
+    name = parts.path.strip('/') + (f"?{parts.query}" if parts.query else "")
+    return os.path.join(pages_dir, re.sub(r'[^\w.-]', '_', name) + '.html')
+
+
+def save_page(url, html, pages_dir=PAGES_DIR):
+    """Store a fetched page so the stub server can replay it"""
+    os.makedirs(pages_dir, exist_ok=True)
+    with open(page_path(url, pages_dir), 'w', encoding='utf-8') as f:
+        f.write(html)
+
+
+def make_handler(pages_dir, delay=0.0):
+    class SavedPageHandler(BaseHTTPRequestHandler):
+        """Serves saved pages over keep-alive HTTP/1.1 connections, honouring If-None-Match"""
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            path = page_path(self.path, pages_dir)
+            if not os.path.exists(path):
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            with open(path, 'rb') as f:
+                body = f.read()
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return SavedPageHandler
+
+
+def start_server(pages_dir=PAGES_DIR, host='127.0.0.1', port=0, delay=0.0):
+    """Create a threaded stub server; call serve_forever() on the result to start it"""
+    return ThreadingHTTPServer((host, port), make_handler(pages_dir, delay))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve saved Zomato pages for offline scraper runs")
+    parser.add_argument('--pages-dir', default=PAGES_DIR)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--delay', type=float, default=0.0, help="Artificial per-request latency in seconds")
+    args = parser.parse_args()
+
+    server = start_server(args.pages_dir, port=args.port, delay=args.delay)
+    print(f"Serving {args.pages_dir} at http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()